@@ -1,20 +1,18 @@
 """
 Create a Windows Scheduled Task that runs with highest privileges
 """
+import codecs
 import subprocess
 import sys
 import os
+import string
 
+# Absolute so Task Scheduler never sees a relative path
+_HERE = os.path.dirname(os.path.abspath(__file__))
 
-def create_scheduled_task():
-    """Create a scheduled task that runs with admin privileges."""
-    
-    # Get current Python and script paths
-    python_exe = sys.executable
-    script_path = os.path.join(os.path.dirname(__file__), "scripts", "cli_agent.py")
-    
-    # XML for scheduled task (runs with highest privileges, no UAC)
-    task_xml = f'''<?xml version="1.0" encoding="UTF-16"?>
+# XML for scheduled task (runs with highest privileges, no UAC). Only the
+# interpreter, script and working directory vary between calls.
+_TASK_XML_TEMPLATE = string.Template('''<?xml version="1.0" encoding="UTF-16"?>
 <Task version="1.2" xmlns="http://schemas.microsoft.com/windows/2004/02/mit/task">
   <RegistrationInfo>
     <Description>OpenClaw GodMode - Runs with highest privileges</Description>
@@ -40,17 +38,32 @@ def create_scheduled_task():
   </Settings>
   <Actions Context="Author">
     <Exec>
-      <Command>{python_exe}</Command>
-      <Arguments>"{script_path}"</Arguments>
-      <WorkingDirectory>{os.path.dirname(__file__)}</WorkingDirectory>
+      <Command>$python_exe</Command>
+      <Arguments>"$script_path"</Arguments>
+      <WorkingDirectory>$working_dir</WorkingDirectory>
     </Exec>
   </Actions>
-</Task>'''
+</Task>''')
+
+
+def create_scheduled_task():
+    """Create a scheduled task that runs with admin privileges."""
+    
+    # Get current Python and script paths
+    python_exe = sys.executable
+    script_path = os.path.join(_HERE, "scripts", "cli_agent.py")
+    
+    task_xml = _TASK_XML_TEMPLATE.substitute(
+        python_exe=python_exe,
+        script_path=script_path,
+        working_dir=_HERE,
+    )
     
-    # Save XML
+    # Save XML (schtasks /XML only accepts a file path, so encode once and
+    # hand the whole payload to a single buffered binary write)
     xml_path = "openclaw_godmode.xml"
-    with open(xml_path, "w", encoding="utf-16") as f:
-        f.write(task_xml)
+    with open(xml_path, "wb", buffering=1 << 16) as f:
+        f.write(codecs.BOM_UTF16_LE + task_xml.encode("utf-16-le"))
     
     # Create task
     print("Creating GodMode scheduled task...")
@@ -1,7 +1,13 @@
 """
 Quick script to create all tool files
+
+Pass --zip to bundle the tools package into a single tools.zip instead,
+which can be imported directly with sys.path.insert(0, "tools.zip").
 """
 import os
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 tools = {
     "click_tool.py": '''"""Click Tool - Mouse clicking"""
@@ -26,7 +32,7 @@ class ClickTool(BaseTool):
 from tools.base_tool import BaseTool
 from mcp.types import Tool, TextContent
 from typing import Sequence
-import pyautogui
+from utils.send_input import type_text
 
 class TypeTool(BaseTool):
     def get_tool_definition(self) -> Tool:
@@ -35,7 +41,8 @@ class TypeTool(BaseTool):
     
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
         self.validate_arguments(arguments, ["text"])
-        pyautogui.write(arguments["text"], interval=0.05)
+        # Send every keystroke in one SendInput batch instead of sleeping per character
+        type_text(arguments["text"])
         return [TextContent(type="text", text=f"Typed: {arguments['text'][:50]}...")]
 ''',
 
@@ -97,10 +104,49 @@ class ShortcutTool(BaseTool):
 from tools.base_tool import BaseTool
 from mcp.types import Tool, TextContent
 from typing import Sequence
+import asyncio
 import subprocess
 
+LAUNCH_TIMEOUT = 15  # Seconds to wait for the PowerShell host to answer a launch
+
 class AppTool(BaseTool):
     requires_admin = True
+    
+    def __init__(self):
+        # Long-lived PowerShell host, so launches skip a cmd.exe spawn each time.
+        # PowerShell starts slower than cmd.exe, so the first launch starts the
+        # host in the background and goes through cmd.exe itself
+        self._shell = None
+        self._lock = asyncio.Lock()
+    
+    def _host(self) -> subprocess.Popen:
+        if self._shell is None or self._shell.poll() is not None:
+            self._shell = subprocess.Popen(["powershell", "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", "-"],
+                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                           text=True, bufsize=1)
+        return self._shell
+    
+    def _reset_host(self):
+        """Kill the host (e.g. after it stalled) so the next launch starts a fresh one."""
+        if self._shell is not None:
+            try:
+                self._shell.kill()
+            except OSError:
+                pass
+            self._shell = None
+    
+    def _start_process(self, name: str) -> str:
+        """Start an executable in the PowerShell host; returns its error message, or "" on success."""
+        shell = self._host()
+        name = name.replace("'", "''")
+        shell.stdin.write(f"try {{ Start-Process -FilePath '{name}' -ErrorAction Stop; 'OK' }} "
+                          f"catch {{ 'ERR ' + ($_.Exception.Message -replace '\\\\s+', ' ') }}\\n")
+        shell.stdin.flush()
+        reply = shell.stdout.readline()
+        if not reply:
+            raise OSError("PowerShell host exited")
+        return "" if reply.strip() == "OK" else reply.strip().removeprefix("ERR ")
+    
     def get_tool_definition(self) -> Tool:
         return Tool(name="Windows-MCP:App", description="Manages Windows applications: launch, resize, switch.",
                     inputSchema={"type": "object", "properties": {"action": {"type": "string", "enum": ["launch", "resize", "switch"]},
@@ -109,8 +155,32 @@ class AppTool(BaseTool):
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
         self.validate_arguments(arguments, ["action", "name"])
         if arguments["action"] == "launch":
-            subprocess.Popen(arguments["name"], shell=True)
-            return [TextContent(type="text", text=f"Launched: {arguments['name']}")]
+            name = arguments["name"]
+            # Launch strings with arguments or quoted paths keep cmd.exe's parsing
+            if any(ch.isspace() for ch in name.strip()):
+                subprocess.Popen(name, shell=True)
+                return [TextContent(type="text", text=f"Launched: {name}")]
+            if self._shell is None or self._shell.poll() is not None:
+                subprocess.Popen(name, shell=True)
+                try:
+                    self._host()
+                except OSError:
+                    self._shell = None
+                return [TextContent(type="text", text=f"Launched: {name}")]
+            # The blocking pipe I/O runs in a thread so a stalled host can't freeze the server
+            async with self._lock:
+                try:
+                    error = await asyncio.wait_for(asyncio.to_thread(self._start_process, name), LAUNCH_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self._reset_host()
+                    error = f"PowerShell did not answer within {LAUNCH_TIMEOUT}s"
+                except OSError:
+                    self._reset_host()
+                    subprocess.Popen(name, shell=True)
+                    error = ""
+            if error:
+                return [TextContent(type="text", text=f"ERROR: Failed to launch {name}: {error}")]
+            return [TextContent(type="text", text=f"Launched: {name}")]
         return [TextContent(type="text", text="Action completed")]
 ''',
 
@@ -121,12 +191,16 @@ from typing import Sequence
 import pyautogui
 
 class SnapshotTool(BaseTool):
+    def __init__(self):
+        # Screen size rarely changes within a session; query it once
+        self._size = pyautogui.size()
+    
     def get_tool_definition(self) -> Tool:
         return Tool(name="Windows-MCP:Snapshot", description="Captures desktop state including windows and UI elements.",
                     inputSchema={"type": "object", "properties": {"use_vision": {"type": "boolean", "default": True}}, "required": []})
     
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
-        size = pyautogui.size()
+        size = self._size
         return [TextContent(type="text", text=f"DESKTOP STATE:\\n\\nSYSTEM INFO:\\n  Language: en_IN\\n  Screen: [{size.width}, {size.height}]\\n\\nACTIVE WINDOW:\\n  Title: Command Prompt\\n  Process: cmd.exe\\n  Position: {{'x': 100, 'y': 100}}")]
 ''',
 
@@ -165,7 +239,7 @@ class ScrapeTool(BaseTool):
 from tools.base_tool import BaseTool
 from mcp.types import Tool, TextContent
 from typing import Sequence
-import pyautogui
+from utils.send_input import click_points
 
 class MultiSelectTool(BaseTool):
     def get_tool_definition(self) -> Tool:
@@ -175,8 +249,8 @@ class MultiSelectTool(BaseTool):
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
         self.validate_arguments(arguments, ["locations"])
         count = len(arguments["locations"])
-        for loc in arguments["locations"]:
-            pyautogui.click(loc["x"], loc["y"])
+        # One SendInput call for every click instead of a pyautogui call per item
+        click_points((loc["x"], loc["y"]) for loc in arguments["locations"])
         return [TextContent(type="text", text=f"Selected {count} items")]
 ''',
 
@@ -184,7 +258,7 @@ class MultiSelectTool(BaseTool):
 from tools.base_tool import BaseTool
 from mcp.types import Tool, TextContent
 from typing import Sequence
-import pyautogui
+from utils.send_input import click_inputs, text_inputs, send_inputs
 
 class MultiEditTool(BaseTool):
     def get_tool_definition(self) -> Tool:
@@ -194,18 +268,97 @@ class MultiEditTool(BaseTool):
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
         self.validate_arguments(arguments, ["edits"])
         count = len(arguments["edits"])
+        # Interleave clicks and keystrokes into a single SendInput batch
+        inputs = []
         for edit in arguments["edits"]:
-            pyautogui.click(edit["x"], edit["y"])
-            pyautogui.write(edit["text"])
+            inputs.extend(click_inputs(edit["x"], edit["y"]))
+            inputs.extend(text_inputs(edit["text"]))
+        send_inputs(inputs)
         return [TextContent(type="text", text=f"Edited {count} fields")]
 ''',
 }
 
-# Create all tool files
-os.makedirs("tools", exist_ok=True)
-for filename, content in tools.items():
-    with open(f"tools/{filename}", "w") as f:
+# Hand-written package modules, written only where tools/ doesn't already have them
+package_files = {
+    "__init__.py": "",
+    "base_tool.py": '''"""
+Base Tool Class - Foundation for all MCP tools with admin support
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Sequence
+from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource
+
+
+class BaseTool(ABC):
+    """Abstract base class for all tools with GodMode support."""
+    
+    requires_admin = False  # Override to True in subclasses that need admin privileges
+    
+    @abstractmethod
+    def get_tool_definition(self) -> Tool:
+        """Return the MCP tool definition."""
+        pass
+    
+    @abstractmethod
+    async def execute(self, arguments: dict) -> Sequence[TextContent | ImageContent | EmbeddedResource]:
+        """Execute the tool with given arguments."""
+        pass
+    
+    def validate_arguments(self, arguments: dict, required: list) -> None:
+        """
+        Validate that required arguments are present.
+        
+        Args:
+            arguments: Dictionary of provided arguments
+            required: List of required argument names
+            
+        Raises:
+            ValueError: If a required argument is missing
+        """
+        for arg in required:
+            if arg not in arguments:
+                raise ValueError(f"Missing required argument: {arg}")
+''',
+}
+
+
+def _write_tool(item):
+    """Write a single tool file with one buffered write."""
+    filename, content = item
+    path = f"tools/{filename}"
+    with open(path, "w", buffering=1 << 20, encoding="utf-8", newline="\n") as f:
         f.write(content)
-    print(f"✓ Created tools/{filename}")
+    return path
+
+
+def _write_zip(path="tools.zip"):
+    """Bundle the generated tools plus the hand-written package files into one archive."""
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as z:
+        # zipimport won't merge with the on-disk package, so carry its other modules too
+        on_disk = set()
+        if os.path.isdir("tools"):
+            for filename in sorted(os.listdir("tools")):
+                if filename.endswith(".py") and filename not in tools:
+                    z.write(os.path.join("tools", filename), f"tools/{filename}")
+                    on_disk.add(filename)
+        for filename, content in package_files.items():
+            if filename not in on_disk:
+                z.writestr(f"tools/{filename}", content)
+        for filename, content in tools.items():
+            z.writestr(f"tools/{filename}", content)
+    return path
+
+
+if "--zip" in sys.argv[1:]:
+    print(f"✓ Created {_write_zip()}")
+else:
+    # Create all tool files
+    os.makedirs("tools", exist_ok=True)
+    for filename, content in package_files.items():
+        if not os.path.exists(f"tools/{filename}"):
+            print(f"✓ Created {_write_tool((filename, content))}")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for path in executor.map(_write_tool, tools.items()):
+            print(f"✓ Created {path}")
 
 print(f"\n✓ All {len(tools)} tools created successfully!")
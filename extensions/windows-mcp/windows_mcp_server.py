@@ -6,40 +6,47 @@ import json
 
 app = Server("windows-automation")
 
+# Tool schemas are static, so build them once at import time
+_TOOLS = [
+    Tool(
+        name="screenshot",
+        description="Take a screenshot",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        }
+    ),
+    Tool(
+        name="click",
+        description="Click at coordinates",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "x": {"type": "number"},
+                "y": {"type": "number"}
+            },
+            "required": ["x", "y"]
+        }
+    ),
+]
+
 @app.list_tools()
 async def list_tools():
-    return [
-        Tool(
-            name="screenshot",
-            description="Take a screenshot",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-            }
-        ),
-        Tool(
-            name="click",
-            description="Click at coordinates",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "x": {"type": "number"},
-                    "y": {"type": "number"}
-                },
-                "required": ["x", "y"]
-            }
-        ),
-    ]
+    return _TOOLS
+
+def _snap_and_save():
+    screenshot = pyautogui.screenshot()
+    screenshot.save("screenshot.png")
 
 @app.call_tool()
 async def call_tool(name: str, arguments: dict):
+    # pyautogui calls block, so run them off the event loop
     if name == "screenshot":
-        screenshot = pyautogui.screenshot()
-        screenshot.save("screenshot.png")
+        await asyncio.to_thread(_snap_and_save)
         return [TextContent(type="text", text="Screenshot saved")]
     
     elif name == "click":
-        pyautogui.click(arguments["x"], arguments["y"])
+        await asyncio.to_thread(pyautogui.click, arguments["x"], arguments["y"])
         return [TextContent(type="text", text=f"Clicked at {arguments['x']}, {arguments['y']}")]
 
 async def main():
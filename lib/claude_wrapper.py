@@ -1,14 +1,49 @@
 """
 Claude Wrapper - Enhanced Anthropic API client for OpenClaw
 """
+from __future__ import annotations
+
+import asyncio
+import importlib.util
 import logging
 import json
-from typing import List, Dict, Any, Optional
-from anthropic import Anthropic
-import anthropic
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable, Awaitable, Tuple
+
+# anthropic pulls in httpx/pydantic; it is imported lazily in ClaudeWrapper.__init__
+if TYPE_CHECKING:
+    import anthropic
 
 logger = logging.getLogger(__name__)
 
+# Keep connections alive between back-to-back agent calls so each tool loop
+# iteration reuses an open TLS session. HTTP/2 needs the optional h2 package.
+HTTP_LIMITS = {"max_keepalive_connections": 32, "max_connections": 64, "keepalive_expiry": 300}
+HTTP_TIMEOUT = 60.0
+HTTP_CONNECT_TIMEOUT = 10.0
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+# ANTHROPIC_API_KEY from the first successful _read_env_key() call
+_env_api_key: Optional[str] = None
+
+
+def _read_env_key() -> Optional[str]:
+    """Load .env and return ANTHROPIC_API_KEY, if any (remembered once found)."""
+    global _env_api_key
+    if _env_api_key:
+        return _env_api_key
+    
+    from dotenv import load_dotenv
+    import os
+    
+    # Load .env from openclaw root directory
+    env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
+    load_dotenv(env_path)
+    
+    # A missing key is not remembered, so adding it to .env later still works
+    _env_api_key = os.environ.get("ANTHROPIC_API_KEY")
+    return _env_api_key
+
 
 class ClaudeWrapper:
     """Wrapper for Claude API with OpenClaw enhancements."""
@@ -18,24 +53,32 @@ class ClaudeWrapper:
         if not api_key:
             api_key = self._load_api_key()
         
-        self.client = Anthropic(api_key=api_key)
-        self.model = model.replace("anthropic/", "")  # Remove prefix for API
+        import httpx
+        from anthropic import Anthropic, AsyncAnthropic
+        
+        limits = httpx.Limits(**HTTP_LIMITS)
+        timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        self.http_client = httpx.Client(http2=HTTP2_AVAILABLE, limits=limits, timeout=timeout)
+        self.client = Anthropic(api_key=api_key, http_client=self.http_client, max_retries=2)
+        self.async_client = AsyncAnthropic(
+            api_key=api_key,
+            http_client=httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, timeout=timeout),
+            max_retries=2,
+        )
+        self.model = model.removeprefix("anthropic/")  # Remove prefix for API
         self.default_max_tokens = 4096
+        self._base_params = {
+            "model": self.model,
+            "max_tokens": self.default_max_tokens,
+            "temperature": 1.0,
+        }
         
-        logger.info(f"Claude Wrapper initialized with model: {self.model}")
+        logger.info("Claude Wrapper initialized with model: %s", self.model)
     
     def _load_api_key(self) -> str:
         """Load API key from .env file or environment."""
         try:
-            # Try loading from .env file
-            from dotenv import load_dotenv
-            import os
-            
-            # Load .env from openclaw root directory
-            env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-            load_dotenv(env_path)
-            
-            api_key = os.environ.get("ANTHROPIC_API_KEY")
+            api_key = _read_env_key()
             if not api_key:
                 raise ValueError(
                     "No API key found in .env file. Add: ANTHROPIC_API_KEY=your-key"
@@ -47,7 +90,7 @@ class ClaudeWrapper:
         except ImportError:
             raise ValueError("python-dotenv not installed. Run: pip install python-dotenv")
         except Exception as e:
-            logger.error(f"Failed to load API key: {e}")
+            logger.error("Failed to load API key: %s", e)
             raise
     
     def create_message(
@@ -73,16 +116,45 @@ class ClaudeWrapper:
         Returns:
             Claude API Message object
         """
-        params = {
-            "model": self.model,
-            "max_tokens": max_tokens or self.default_max_tokens,
-            "messages": messages,
-            "temperature": temperature,
-        }
+        params = self._build_params(messages, tools, system, max_tokens, temperature, **kwargs)
+        
+        logger.info("-> Calling Claude API (%s)", self.model)
+        logger.debug("  Messages: %d, Tools: %d", len(messages), len(tools) if tools else 0)
+        
+        try:
+            response = self.client.messages.create(**params)
+            
+            logger.info("<- Response received: %s", response.stop_reason)
+            logger.debug("  Usage - Input: %s, Output: %s", response.usage.input_tokens, response.usage.output_tokens)
+            
+            return response
+            
+        except Exception as e:
+            logger.error("Claude API error: %s", e, exc_info=True)
+            raise
+    
+    def _build_params(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        system: Optional[str],
+        max_tokens: Optional[int],
+        temperature: float,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Build the request parameters shared by the sync and async paths."""
+        params = self._base_params.copy()
+        params["messages"] = messages
+        
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+        
+        if temperature != 1.0:
+            params["temperature"] = temperature
         
         if tools:
             params["tools"] = tools
-            logger.debug(f"Calling Claude with {len(tools)} tools available")
+            logger.debug("Calling Claude with %d tools available", len(tools))
         
         if system:
             params["system"] = system
@@ -90,58 +162,201 @@ class ClaudeWrapper:
         # Merge additional parameters
         params.update(kwargs)
         
-        logger.info(f"-> Calling Claude API ({self.model})")
-        logger.debug(f"  Messages: {len(messages)}, Tools: {len(tools) if tools else 0}")
+        return params
+    
+    async def create_message_async(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        system: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: float = 1.0,
+        **kwargs
+    ) -> anthropic.types.Message:
+        """
+        Async variant of create_message that does not block the event loop.
+        
+        Takes the same arguments as create_message.
+        
+        Returns:
+            Claude API Message object
+        """
+        params = self._build_params(messages, tools, system, max_tokens, temperature, **kwargs)
+        
+        logger.info("-> Calling Claude API async (%s)", self.model)
         
         try:
-            response = self.client.messages.create(**params)
+            response = await self.async_client.messages.create(**params)
             
-            logger.info(f"<- Response received: {response.stop_reason}")
-            logger.debug(f"  Usage - Input: {response.usage.input_tokens}, Output: {response.usage.output_tokens}")
+            logger.info("<- Response received: %s", response.stop_reason)
+            logger.debug("  Usage - Input: %s, Output: %s", response.usage.input_tokens, response.usage.output_tokens)
             
             return response
             
         except Exception as e:
-            logger.error(f"Claude API error: {e}", exc_info=True)
+            logger.error("Claude API error: %s", e, exc_info=True)
             raise
     
-    def extract_text(self, response: anthropic.types.Message) -> str:
-        """Extract all text content from Claude's response."""
-        text_parts = []
-        for block in response.content:
-            if block.type == "text":
-                text_parts.append(block.text)
-        return "\n".join(text_parts)
+    def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        system: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: float = 1.0,
+        on_text: Optional[Callable[[str], None]] = None,
+        on_tool_use: Optional[Callable[[Dict[str, Any]], None]] = None,
+        **kwargs
+    ) -> anthropic.types.Message:
+        """
+        Stream a message from Claude, surfacing blocks as they complete.
+        
+        Args:
+            on_text: Called with each text delta as it arrives
+            on_tool_use: Called with each tool use dict ('id', 'name', 'input')
+                as soon as its block is finalized
+            Other arguments are the same as create_message.
+        
+        Returns:
+            The final Claude API Message object
+        """
+        params = self._build_params(messages, tools, system, max_tokens, temperature, **kwargs)
+        
+        logger.info("-> Streaming Claude API (%s)", self.model)
+        
+        try:
+            with self.client.messages.stream(**params) as stream:
+                for event in stream:
+                    if event.type == "text":
+                        if on_text:
+                            on_text(event.text)
+                    elif event.type == "content_block_stop" and on_tool_use:
+                        block = stream.current_message_snapshot.content[event.index]
+                        if block.type == "tool_use":
+                            on_tool_use({
+                                "id": block.id,
+                                "name": block.name,
+                                "input": block.input
+                            })
+                response = stream.get_final_message()
+            
+            logger.info("<- Stream finished: %s", response.stop_reason)
+            logger.debug("  Usage - Input: %s, Output: %s", response.usage.input_tokens, response.usage.output_tokens)
+            
+            return response
+            
+        except Exception as e:
+            logger.error("Claude API error: %s", e, exc_info=True)
+            raise
     
-    def extract_tool_uses(self, response: anthropic.types.Message) -> List[Dict[str, Any]]:
+    async def stream_message_async(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        system: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: float = 1.0,
+        on_text: Optional[Callable[[str], None]] = None,
+        on_tool_use: Optional[Callable[[Dict[str, Any]], None]] = None,
+        **kwargs
+    ) -> anthropic.types.Message:
         """
-        Extract tool use blocks from Claude's response.
+        Async variant of stream_message; callbacks run on the event loop.
+        
+        Takes the same arguments as stream_message.
         
         Returns:
-            List of dicts with 'id', 'name', and 'input'
+            The final Claude API Message object
         """
+        params = self._build_params(messages, tools, system, max_tokens, temperature, **kwargs)
+        
+        logger.info("-> Streaming Claude API async (%s)", self.model)
+        
+        try:
+            async with self.async_client.messages.stream(**params) as stream:
+                async for event in stream:
+                    if event.type == "text":
+                        if on_text:
+                            on_text(event.text)
+                    elif event.type == "content_block_stop" and on_tool_use:
+                        block = stream.current_message_snapshot.content[event.index]
+                        if block.type == "tool_use":
+                            on_tool_use({
+                                "id": block.id,
+                                "name": block.name,
+                                "input": block.input
+                            })
+                response = await stream.get_final_message()
+            
+            logger.info("<- Stream finished: %s", response.stop_reason)
+            logger.debug("  Usage - Input: %s, Output: %s", response.usage.input_tokens, response.usage.output_tokens)
+            
+            return response
+            
+        except Exception as e:
+            logger.error("Claude API error: %s", e, exc_info=True)
+            raise
+    
+    def split_response(self, response: anthropic.types.Message) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Partition Claude's response content in a single pass.
+        
+        Returns:
+            Tuple of (joined text, list of tool use dicts with 'id', 'name', 'input')
+        """
+        text_parts = []
         tool_uses = []
         for block in response.content:
-            if block.type == "tool_use":
+            block_type = block.type
+            if block_type == "text":
+                text_parts.append(block.text)
+            elif block_type == "tool_use":
                 tool_uses.append({
                     "id": block.id,
                     "name": block.name,
                     "input": block.input
                 })
-        return tool_uses
+        return "\n".join(text_parts), tool_uses
+    
+    def extract_text(self, response: anthropic.types.Message) -> str:
+        """Extract all text content from Claude's response."""
+        return self.split_response(response)[0]
+    
+    def extract_tool_uses(self, response: anthropic.types.Message) -> List[Dict[str, Any]]:
+        """
+        Extract tool use blocks from Claude's response.
+        
+        Returns:
+            List of dicts with 'id', 'name', and 'input'
+        """
+        return self.split_response(response)[1]
     
     def format_tool_result(self, tool_use_id: str, content: str, is_error: bool = False) -> Dict[str, Any]:
         """Format a tool result for Claude."""
-        result = {
-            "type": "tool_result",
-            "tool_use_id": tool_use_id,
-            "content": content
-        }
-        
         if is_error:
-            result["is_error"] = True
+            return {"type": "tool_result", "tool_use_id": tool_use_id, "content": content, "is_error": True}
+        return {"type": "tool_result", "tool_use_id": tool_use_id, "content": content}
+    
+    async def run_tools_parallel(
+        self,
+        tool_uses: List[Dict[str, Any]],
+        dispatch: Callable[[Dict[str, Any]], Awaitable[Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run independent tool uses concurrently and format their results.
         
-        return result
+        Args:
+            tool_uses: Tool use dicts as returned by extract_tool_uses
+            dispatch: Coroutine function that executes a single tool use
+        
+        Returns:
+            Tool result blocks in the same order as tool_uses
+        """
+        results = await asyncio.gather(*(dispatch(tool_use) for tool_use in tool_uses), return_exceptions=True)
+        return [
+            self.format_tool_result(tool_use["id"], str(result), is_error=isinstance(result, Exception))
+            for tool_use, result in zip(tool_uses, results)
+        ]
 
 
 # Test function
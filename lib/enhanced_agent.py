@@ -5,18 +5,96 @@ Orchestrates Claude + MCP tools for multi-step task execution
 import asyncio
 import logging
 import json
+import re
 import sys
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-# Add parent directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
+# Only when run directly as a script; importers (scripts/cli_agent.py,
+# python -m lib.enhanced_agent) already have the repo root on sys.path
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from lib.claude_wrapper import ClaudeWrapper
 from lib.mcp_tools_manager import MCPToolsManager
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson  # Optional: faster JSON for config and tool input previews
+except ImportError:
+    orjson = None
+
+
+def _json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _json_dumps_pretty(obj: Any) -> str:
+    if orjson:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, indent=2)
+
+
+SIMPLE_SYSTEM_PROMPT = (
+    "You are OpenClaw, an AI agent that can control a Windows computer. "
+    "Reply briefly and conversationally."
+)
+
+# Greetings, thanks and "what can you do" style messages that never need tools.
+# Bare confirmations ("ok", "help") are left out: they often answer a question
+# Claude asked mid-task and need the tools to carry on
+SIMPLE_MESSAGE_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|yo|thanks|thank you|thx|bye|good (morning|afternoon|evening|night)"
+    r"|who are you|what can you do|what are you|how are you)\b[\s!.?]*$",
+    re.IGNORECASE
+)
+
+# Lets Claude hand over a whole multi-step plan in one call; independent
+# steps then run together instead of costing a round trip each
+SUBMIT_PLAN_TOOL = {
+    "name": "submit_plan",
+    "description": (
+        "Submit several tool calls at once as a dependency graph. Steps whose "
+        "dependencies are done run in parallel; all results come back together."
+    ),
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "steps": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string", "description": "Unique step id"},
+                        "tool": {"type": "string", "description": "Name of the tool to call"},
+                        "input": {"type": "object", "description": "Tool input"},
+                        "depends_on": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Ids of steps that must finish first"
+                        }
+                    },
+                    "required": ["id", "tool", "input"]
+                }
+            }
+        },
+        "required": ["steps"]
+    }
+}
+
+EPHEMERAL_CACHE = {"type": "ephemeral"}
+
+PLANNER_PROMPT = (
+    "\n\nWhen a task needs several tool calls that you can decide up front, call "
+    "submit_plan once with all of them, listing in depends_on only the steps that "
+    "must finish first. Use individual tool calls when a step depends on reading "
+    "an earlier result."
+)
+
 
 class EnhancedAgent:
     """
@@ -35,7 +113,30 @@ class EnhancedAgent:
         # Agent state
         self.conversation_history: List[Dict[str, Any]] = []
         self.max_iterations = self.config['agent']['max_iterations']
+        self.history_token_budget = self.config['agent'].get('history_token_budget', 50000)
+        self.loop_detection_threshold = self.config['agent'].get('loop_detection_threshold', 3)
+        self.max_tool_result_chars = self.config['agent'].get('max_tool_result_chars', 20000)
         self.system_prompt = self.config['claude']['system_prompt']
+        self.stream = self.config['claude'].get('stream', True)
+        self.prompt_caching = self.config['claude'].get('prompt_caching', True)
+        self.enable_planner = self.config['agent'].get('enable_planner', False)
+        if self.enable_planner:
+            self.system_prompt += PLANNER_PROMPT
+        
+        # Small talk skips the tool schemas and full prompt, optionally on a faster model
+        self.route_simple_messages = self.config['claude'].get('route_simple_messages', True)
+        self.simple_model = self.config['claude'].get('simple_model')
+        self.simple_system_prompt = self.config['claude'].get('simple_system_prompt', SIMPLE_SYSTEM_PROMPT)
+        
+        # Untruncated tool output, keyed by tool_use_id (dropped with its history)
+        self.full_tool_results: Dict[str, str] = {}
+        
+        # tool_use_ids whose MCP result asked not to be cached (_meta.cache_hint),
+        # pruned along with the history
+        self._no_cache_tool_ids: set = set()
+        
+        # Cap tool fan-out so a large batch doesn't flood the MCP stdio servers
+        self._tool_semaphore = asyncio.Semaphore(self.config['agent'].get('max_concurrent_tools', 5))
         
         logger.info("Enhanced Agent initialized")
     
@@ -45,8 +146,8 @@ class EnhancedAgent:
         if not config_file.exists():
             raise FileNotFoundError(f"Config not found: {self.config_path}")
         
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        with open(config_file, 'rb') as f:
+            return _json_loads(f.read())
     
     async def initialize(self):
         """Initialize Claude client and MCP manager."""
@@ -64,7 +165,9 @@ class EnhancedAgent:
         # Initialize MCP
         logger.info("\nInitializing MCP Tools Manager...")
         self.mcp = MCPToolsManager(
-            config_path=self.config['mcp']['config_path']
+            config_path=self.config['mcp']['config_path'],
+            enable_tool_caching=self.config['agent'].get('enable_tool_caching', False),
+            cache_tool_catalog=self.config['agent'].get('cache_tool_catalog', False)
         )
         await self.mcp.initialize()
         
@@ -94,17 +197,32 @@ class EnhancedAgent:
             print(f"USER: {user_message}")
             print(f"{'='*60}\n")
         
-        # Add user message to conversation
-        messages = self.conversation_history.copy()
+        # Add user message to conversation (extends the history in place; it is
+        # pruned to its budget once the turn finishes)
+        messages = self.conversation_history
+        history_length = len(messages)
         messages.append({"role": "user", "content": user_message})
         
-        # Get available tools
-        tools = self.mcp.get_tools_for_claude()
+        # Get available tools (small talk goes without them, unless the history
+        # already holds tool blocks, which the API only accepts alongside tools)
+        if (self.route_simple_messages and self._is_simple_message(user_message)
+                and not self._has_tool_blocks(messages)):
+            tools = []
+            overrides = {"system": self.simple_system_prompt}
+            if self.simple_model:
+                overrides["model"] = self.simple_model.removeprefix("anthropic/")
+        else:
+            tools = self.mcp.get_tools_for_claude()
+            if self.enable_planner:
+                tools = tools + [SUBMIT_PLAN_TOOL]
+            overrides = {}
         
         # Tracking
         iterations = 0
         tools_used = []
         final_response = None
+        last_errors = None
+        repeated_errors = 0
         
         # Agentic loop
         while iterations < self.max_iterations:
@@ -113,17 +231,18 @@ class EnhancedAgent:
             if verbose:
                 print(f"[Iteration {iterations}]")
             
+            # Tool calls that started while Claude was still streaming, by tool_use id
+            started_tools: Dict[str, asyncio.Task] = {}
+            
             # Call Claude
             try:
-                response = self.claude.create_message(
-                    messages=messages,
-                    tools=tools,
-                    system=self.system_prompt,
-                    max_tokens=self.config['claude']['max_tokens'],
-                    temperature=self.config['claude']['temperature']
-                )
+                response = await self._call_claude(messages, tools, started_tools, **overrides)
             except Exception as e:
                 logger.error(f"Claude API error: {e}", exc_info=True)
+                self._cancel_tools(started_tools)
+                # Failed turns are not kept in the history
+                self.conversation_history = messages[:history_length]
+                self._forget_pruned_results()
                 return {
                     "response": f"Error calling Claude: {str(e)}",
                     "iterations": iterations,
@@ -132,6 +251,9 @@ class EnhancedAgent:
                     "error": True
                 }
             
+            if response.stop_reason != "tool_use":
+                self._cancel_tools(started_tools)
+            
             # Check stop reason
             if response.stop_reason == "end_turn":
                 # Task completed
@@ -160,8 +282,8 @@ class EnhancedAgent:
                     "content": response.content
                 })
                 
-                # Execute all tools
-                tool_results = await self._execute_tools(tool_uses, verbose)
+                # Execute all tools (some may already be running)
+                tool_results = await self._execute_tools(tool_uses, verbose, started_tools)
                 tools_used.extend([tu["name"] for tu in tool_uses])
                 
                 # Add tool results to conversation
@@ -169,6 +291,22 @@ class EnhancedAgent:
                     "role": "user",
                     "content": tool_results
                 })
+                
+                # Bail out if the same tool errors keep coming back
+                errors = tuple(
+                    (tu["name"], tr["content"])
+                    for tu, tr in zip(tool_uses, tool_results)
+                    if tr.get("is_error")
+                )
+                repeated_errors = repeated_errors + 1 if errors and errors == last_errors else 0
+                last_errors = errors
+                if errors and repeated_errors + 1 >= self.loop_detection_threshold:
+                    logger.warning("Loop detected: identical tool errors repeated")
+                    final_response = (
+                        f"Stopped after the same tool error repeated {repeated_errors + 1} times: "
+                        f"{errors[0][1]}"
+                    )
+                    break
             
             elif response.stop_reason == "max_tokens":
                 logger.warning("Hit max tokens limit")
@@ -186,8 +324,9 @@ class EnhancedAgent:
             logger.warning("Hit maximum iterations")
             final_response = final_response or "Maximum iterations reached. Task may be incomplete."
         
-        # Update conversation history (keep last 20 messages)
-        self.conversation_history = messages[-20:]
+        # Update conversation history (bounded by an approximate token budget)
+        self.conversation_history = self._prune_history(messages)
+        self._forget_pruned_results()
         
         return {
             "response": final_response,
@@ -197,79 +336,334 @@ class EnhancedAgent:
             "error": False
         }
     
+    @staticmethod
+    def _is_simple_message(user_message: str) -> bool:
+        """True for short small-talk messages that don't need any tools."""
+        return len(user_message) <= 60 and SIMPLE_MESSAGE_PATTERN.match(user_message) is not None
+    
+    @staticmethod
+    def _has_tool_blocks(messages: List[Dict[str, Any]]) -> bool:
+        """True if any message carries a tool_use or tool_result block."""
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                continue
+            for block in content:
+                block_type = block.get("type") if isinstance(block, dict) else getattr(block, "type", None)
+                if block_type in ("tool_use", "tool_result"):
+                    return True
+        return False
+    
+    def _prune_history(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep the most recent messages that fit in history_token_budget.
+        
+        Tokens are estimated at ~4 chars each. The kept history always starts
+        at a plain user turn so tool_use/tool_result pairs are never split.
+        """
+        budget = self.history_token_budget
+        start = len(messages)
+        used = 0
+        
+        while start > 0:
+            cost = self._estimate_tokens(messages[start - 1])
+            if used + cost > budget:
+                break
+            used += cost
+            start -= 1
+        
+        while start < len(messages):
+            message = messages[start]
+            if message["role"] == "user" and isinstance(message["content"], str):
+                break
+            start += 1
+        
+        return messages[start:]
+    
+    def _forget_pruned_results(self):
+        """Drop per-tool-call state whose tool call is no longer in the history."""
+        live_ids = self._tool_result_ids(self.conversation_history)
+        # Plan steps are stored as "<plan id>:<step id>"
+        self.full_tool_results = {
+            tool_id: text for tool_id, text in self.full_tool_results.items()
+            if tool_id.partition(":")[0] in live_ids
+        }
+        self._no_cache_tool_ids &= live_ids
+    
+    @staticmethod
+    def _tool_result_ids(messages: List[Dict[str, Any]]) -> set:
+        """tool_use_ids of every tool_result block in the messages."""
+        return {
+            block["tool_use_id"]
+            for message in messages if not isinstance(message["content"], str)
+            for block in message["content"]
+            if isinstance(block, dict) and block.get("type") == "tool_result"
+        }
+    
+    @staticmethod
+    def _estimate_tokens(message: Dict[str, Any]) -> int:
+        """Rough token estimate for a message (chars / 4)."""
+        content = message["content"]
+        if isinstance(content, str):
+            return len(content) // 4 + 1
+        chars = 0
+        for block in content:
+            if isinstance(block, dict):
+                chars += len(str(block.get("content") or block.get("text") or block))
+            else:
+                chars += len(str(block))
+        return chars // 4 + 1
+    
+    async def _call_claude(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        started_tools: Dict[str, asyncio.Task],
+        **overrides
+    ) -> Any:
+        """
+        Call Claude for one iteration.
+        
+        When streaming, read-only tool_use blocks are dispatched as soon as they
+        are finalized, so they run while Claude is still writing later blocks;
+        dispatch stops at the first mutating call.
+        Overrides (e.g. model, system) replace the configured request params.
+        """
+        params = {
+            "messages": messages,
+            "tools": tools,
+            "system": self.system_prompt,
+            "max_tokens": self.config['claude']['max_tokens'],
+            "temperature": self.config['claude']['temperature']
+        }
+        params.update(overrides)
+        
+        if self.prompt_caching:
+            self._add_cache_breakpoints(params)
+        
+        if not self.stream:
+            return await self.claude.create_message_async(**params)
+        
+        mutating_seen = False
+        
+        def on_tool_use(tool_use: Dict[str, Any]):
+            nonlocal mutating_seen
+            if mutating_seen or not self.mcp.is_parallel_safe(tool_use["name"]):
+                # Everything from the first mutating call on waits for _execute_tools
+                mutating_seen = True
+                return
+            started_tools[tool_use["id"]] = asyncio.ensure_future(self._execute_tool(tool_use))
+        
+        return await self.claude.stream_message_async(on_tool_use=on_tool_use, **params)
+    
+    def _add_cache_breakpoints(self, params: Dict[str, Any]):
+        """
+        Mark stable prompt prefixes for Anthropic prompt caching.
+        
+        Uses three of the four allowed breakpoints: the system prompt, the
+        last tool definition, and the newest cacheable tool_result block.
+        Nothing stored in the history or the MCP tool cache is mutated.
+        """
+        if params.get("system"):
+            params["system"] = [{"type": "text", "text": params["system"], "cache_control": EPHEMERAL_CACHE}]
+        
+        tools = params.get("tools")
+        if tools:
+            params["tools"] = tools[:-1] + [{**tools[-1], "cache_control": EPHEMERAL_CACHE}]
+        
+        messages = params["messages"]
+        for i in range(len(messages) - 1, -1, -1):
+            content = messages[i]["content"]
+            if messages[i]["role"] != "user" or isinstance(content, str) or not content:
+                continue
+            last_block = content[-1]
+            if not isinstance(last_block, dict) or last_block.get("type") != "tool_result":
+                continue
+            if any(block.get("tool_use_id") in self._no_cache_tool_ids for block in content):
+                continue
+            messages = list(messages)
+            messages[i] = {**messages[i], "content": content[:-1] + [{**last_block, "cache_control": EPHEMERAL_CACHE}]}
+            params["messages"] = messages
+            break
+    
+    @staticmethod
+    def _cancel_tools(started_tools: Dict[str, asyncio.Task]):
+        """Cancel early-dispatched tool calls whose results won't be used."""
+        for task in started_tools.values():
+            task.cancel()
+        started_tools.clear()
+    
     async def _execute_tools(
         self,
         tool_uses: List[Dict[str, Any]],
-        verbose: bool = True
+        verbose: bool = True,
+        started_tools: Optional[Dict[str, asyncio.Task]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Execute a list of tool calls via MCP.
+        Execute a list of tool calls via MCP, overlapping read-only ones.
         
         Args:
             tool_uses: List of tool use dictionaries
             verbose: Print execution details
+            started_tools: Already-running executions keyed by tool_use id
             
         Returns:
-            List of tool result dictionaries for Claude
+            List of tool result dictionaries for Claude, in tool_uses order
         """
-        tool_results = []
-        
-        for tool_use in tool_uses:
-            tool_name = tool_use["name"]
-            tool_input = tool_use["input"]
-            tool_id = tool_use["id"]
-            
-            if verbose:
-                print(f"  -> {tool_name}")
-                input_str = json.dumps(tool_input, indent=2)
+        if verbose:
+            for tool_use in tool_uses:
+                print(f"  -> {tool_use['name']}")
+                input_str = _json_dumps_pretty(tool_use["input"])
                 if len(input_str) > 100:
                     input_str = input_str[:100] + "..."
                 print(f"    Input: {input_str}")
-            
-            try:
-                # Execute via MCP
-                result = await self.mcp.execute_tool(tool_name, tool_input)
-                
-                # Extract result content
-                if hasattr(result, 'content') and result.content:
-                    result_text = result.content[0].text
-                else:
-                    result_text = str(result)
-                
-                if verbose:
-                    display_result = result_text[:200] + "..." if len(result_text) > 200 else result_text
-                    print(f"    Result: {display_result}")
-                
-                # Format for Claude
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": tool_id,
-                    "content": result_text
-                })
-            
-            except Exception as e:
-                logger.error(f"Tool execution failed: {tool_name} - {e}", exc_info=True)
-                
-                # Return error to Claude
-                error_msg = f"Error executing {tool_name}: {str(e)}"
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": tool_id,
-                    "content": error_msg,
-                    "is_error": True
-                })
-                
-                if verbose:
-                    print(f"    ERROR: {e}")
+        
+        # Consecutive read-only calls overlap; a mutating call (click, type, ...)
+        # waits for everything before it and runs alone, keeping Claude's order.
+        # _execute_tool never raises, so one failure can't cancel the others
+        started_tools = started_tools or {}
+        tool_results = []
+        batch = []
+        for tool_use in tool_uses:
+            run = started_tools.get(tool_use["id"]) or self._execute_tool(tool_use)
+            if self.mcp.is_parallel_safe(tool_use["name"]):
+                batch.append(run)
+                continue
+            if batch:
+                tool_results.extend(await asyncio.gather(*batch))
+                batch = []
+            tool_results.append(await run)
+        if batch:
+            tool_results.extend(await asyncio.gather(*batch))
         
         if verbose:
+            for tool_use, tool_result in zip(tool_uses, tool_results):
+                result_text = tool_result["content"]
+                if tool_result.get("is_error"):
+                    print(f"    ERROR ({tool_use['name']}): {result_text}")
+                else:
+                    display_result = result_text[:200] + "..." if len(result_text) > 200 else result_text
+                    print(f"    Result ({tool_use['name']}): {display_result}")
             print()
         
         return tool_results
     
+    async def _execute_tool(self, tool_use: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a single tool call and format the result (or error) for Claude."""
+        tool_name = tool_use["name"]
+        tool_id = tool_use["id"]
+        
+        if self.enable_planner and tool_name == SUBMIT_PLAN_TOOL["name"]:
+            return await self._execute_plan(tool_use)
+        
+        try:
+            # Execute via MCP
+            async with self._tool_semaphore:
+                result = await self.mcp.execute_tool(tool_name, tool_use["input"])
+            
+            meta = getattr(result, 'meta', None) or {}
+            if meta.get('cache_hint') == 'no-cache':
+                self._no_cache_tool_ids.add(tool_id)
+            
+            # Extract result content
+            content = getattr(result, 'content', None)
+            result_text = content[0].text if content else str(result)
+            
+            # Keep huge outputs out of the conversation that is resent every iteration
+            if len(result_text) > self.max_tool_result_chars:
+                self.full_tool_results[tool_id] = result_text
+                omitted = len(result_text) - self.max_tool_result_chars
+                result_text = result_text[:self.max_tool_result_chars] + f"\n\n[Truncated {omitted} chars]"
+            
+            # Format for Claude
+            return {
+                "type": "tool_result",
+                "tool_use_id": tool_id,
+                "content": result_text
+            }
+        
+        except Exception as e:
+            logger.error(f"Tool execution failed: {tool_name} - {e}", exc_info=True)
+            
+            # Return error to Claude
+            return {
+                "type": "tool_result",
+                "tool_use_id": tool_id,
+                "content": f"Error executing {tool_name}: {str(e)}",
+                "is_error": True
+            }
+    
+    async def _execute_plan(self, tool_use: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a submit_plan call: execute its steps in dependency waves.
+        
+        Every step whose dependencies have finished runs in the same
+        asyncio.gather wave; steps depending on a failed step are skipped.
+        All step results are returned to Claude in one tool_result.
+        """
+        plan_id = tool_use["id"]
+        steps = tool_use["input"].get("steps") or []
+        step_ids = [str(step.get("id")) for step in steps]
+        
+        error = None
+        if len(set(step_ids)) != len(step_ids):
+            error = "Plan step ids must be unique"
+        elif any(step.get("tool") == SUBMIT_PLAN_TOOL["name"] for step in steps):
+            error = "Plan steps cannot call submit_plan"
+        else:
+            unknown = {dep for step in steps for dep in step.get("depends_on") or []} - set(step_ids)
+            if unknown:
+                error = f"Unknown dependencies: {', '.join(sorted(map(str, unknown)))}"
+        if error:
+            return {"type": "tool_result", "tool_use_id": plan_id, "content": error, "is_error": True}
+        
+        pending = dict(zip(step_ids, steps))
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        while pending:
+            wave = [
+                step_id for step_id, step in pending.items()
+                if all(dep in results for dep in step.get("depends_on") or [])
+            ]
+            if not wave:
+                for step_id in pending:
+                    results[step_id] = {"is_error": True, "content": "Skipped: dependency cycle"}
+                break
+            
+            runnable = []
+            for step_id in wave:
+                step = pending.pop(step_id)
+                failed = [dep for dep in step.get("depends_on") or [] if results[dep]["is_error"]]
+                if failed:
+                    results[step_id] = {"is_error": True, "content": f"Skipped: dependency {failed[0]} failed"}
+                else:
+                    runnable.append((step_id, step))
+            
+            wave_results = await asyncio.gather(*(
+                self._execute_tool({"id": f"{plan_id}:{step_id}", "name": step["tool"], "input": step.get("input") or {}})
+                for step_id, step in runnable
+            ))
+            for (step_id, _), tool_result in zip(runnable, wave_results):
+                results[step_id] = {"is_error": bool(tool_result.get("is_error")), "content": tool_result["content"]}
+        
+        report = [
+            {"id": step_id, "tool": step.get("tool"), **results[step_id]}
+            for step_id, step in zip(step_ids, steps)
+        ]
+        plan_result = {"type": "tool_result", "tool_use_id": plan_id, "content": json.dumps(report, indent=2)}
+        if report and all(r["is_error"] for r in report):
+            plan_result["is_error"] = True
+        return plan_result
+    
+    def get_full_result(self, tool_use_id: str) -> Optional[str]:
+        """Return the untruncated output of a tool call, if it was truncated."""
+        return self.full_tool_results.get(tool_use_id)
+    
     def clear_history(self):
         """Clear conversation history."""
         self.conversation_history.clear()
+        self.full_tool_results.clear()
+        self._no_cache_tool_ids.clear()
         logger.info("Conversation history cleared")
     
     async def close(self):
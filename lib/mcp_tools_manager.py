@@ -2,8 +2,11 @@
 MCP Tools Manager - Enhanced tool discovery and execution for OpenClaw
 """
 import asyncio
+import hashlib
 import json
 import logging
+import time
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 from mcp import ClientSession, StdioServerParameters
@@ -11,17 +14,55 @@ from mcp.client.stdio import stdio_client
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson  # Optional: faster JSON for configs, catalogs and cache keys
+except ImportError:
+    orjson = None
+
+
+def _json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    if orjson:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(obj, sort_keys=sort_keys, default=str).encode()
+
+# Discovered tool catalogs, keyed by a hash of the server configs
+TOOL_CATALOG_CACHE_DIR = Path.home() / ".openclaw" / ".tool_cache"
+TOOL_CATALOG_TTL = 24 * 60 * 60  # Seconds before a cached catalog is rediscovered
+
 
 class MCPToolsManager:
     """Manages MCP server connections and tool execution with caching."""
     
-    def __init__(self, config_path: str = "config/mcp_config.json"):
+    # Read-only tools whose results are safe to reuse for identical arguments
+    CACHEABLE_PREFIXES = ("list_", "describe_", "get_")
+    
+    def __init__(
+        self,
+        config_path: str = "config/mcp_config.json",
+        enable_tool_caching: bool = False,
+        tool_cache_size: int = 128,
+        cache_tool_catalog: bool = False
+    ):
         self.config_path = config_path
         self.sessions: Dict[str, ClientSession] = {}
         self.tools: List[Dict[str, Any]] = []
-        self.tool_cache: Dict[str, Any] = {}
+        self._tool_index: Dict[str, Dict[str, Any]] = {}
+        self.enable_tool_caching = enable_tool_caching
+        self.tool_cache_size = tool_cache_size
+        # Opt-in: a server whose tools change without a version bump would
+        # otherwise be served a stale catalog until TOOL_CATALOG_TTL expires
+        self.cache_tool_catalog = cache_tool_catalog
+        self.tool_cache: "OrderedDict[str, Any]" = OrderedDict()
         self.server_configs: Dict[str, Dict] = {}
-        self._stdio_contexts = []
+        self._server_tasks: Dict[str, asyncio.Task] = {}
+        self._stop_event: Optional[asyncio.Event] = None
+        self._claude_tools: Optional[List[Dict[str, Any]]] = None
+        self._cached_catalog: Dict[str, Dict[str, Any]] = {}
+        self._server_info: Dict[str, List[str]] = {}
         
     async def initialize(self):
         """Initialize all MCP servers and discover tools."""
@@ -35,21 +76,39 @@ class MCPToolsManager:
             logger.error(f"MCP config not found: {self.config_path}")
             raise FileNotFoundError(f"Config file missing: {self.config_path}")
         
-        with open(config_file, 'r') as f:
-            config = json.load(f)
+        with open(config_file, 'rb') as f:
+            config = _json_loads(f.read())
             self.server_configs = config.get('mcpServers', {})
         
         if not self.server_configs:
             logger.warning("No MCP servers configured!")
             return self
         
-        # Connect to each server
-        for server_name, server_config in self.server_configs.items():
-            try:
-                await self._connect_server(server_name, server_config)
-            except Exception as e:
-                logger.error(f"Failed to connect to {server_name}: {e}", exc_info=True)
+        # Reuse the tool catalog from a previous run when the config is unchanged
+        catalog_path = TOOL_CATALOG_CACHE_DIR / f"{self._config_hash()}.json"
+        if self.cache_tool_catalog:
+            self._cached_catalog = self._load_catalog(catalog_path, config_file)
+        
+        # Connect to all servers concurrently; each one's tools are merged in
+        # config order afterwards so tool lookup stays deterministic
+        self._stop_event = asyncio.Event()
+        server_items = list(self.server_configs.items())
+        results = await asyncio.gather(
+            *(self._connect_server(server_name, server_config) for server_name, server_config in server_items),
+            return_exceptions=True
+        )
+        
+        for (server_name, _), result in zip(server_items, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to connect to {server_name}: {result}", exc_info=result)
                 continue
+            for claude_tool in result:
+                self.tools.append(claude_tool)
+                self._tool_index.setdefault(claude_tool["name"], claude_tool)
+        self._claude_tools = None
+        
+        if self.cache_tool_catalog and any(self._cached_tools(server_name) is None for server_name in self.sessions):
+            self._save_catalog(catalog_path)
         
         logger.info("="*60)
         logger.info(f"[OK] Connected to {len(self.sessions)} MCP server(s)")
@@ -64,46 +123,100 @@ class MCPToolsManager:
         
         return self
     
-    async def _connect_server(self, server_name: str, config: Dict[str, Any]):
-        """Connect to a single MCP server and discover its tools."""
+    async def _connect_server(self, server_name: str, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Connect to a single MCP server and return its tools in Claude format."""
         logger.info(f"Connecting to: {server_name}")
         
-        # Validate command
-        command = config.get('command')
-        if not command:
-            raise ValueError(f"No command specified for {server_name}")
-        
-        # Create server parameters
-        params = StdioServerParameters(
-            command=command,
-            args=config.get('args', []),
-            env=config.get('env')
-        )
-        
-        # Create stdio client context
-        stdio_context = stdio_client(params)
-        read_stream, write_stream = await stdio_context.__aenter__()
-        self._stdio_contexts.append((stdio_context, read_stream, write_stream))
-        
-        # Create and initialize session
-        session = ClientSession(read_stream, write_stream)
-        await session.__aenter__()
-        await session.initialize()
-        
-        # Store session
-        self.sessions[server_name] = session
-        
-        # Discover tools
-        tools_response = await session.list_tools()
-        server_tools = tools_response.tools
+        # The connection lives in its own task so its stdio/session contexts
+        # are entered and exited by the same task, even when connecting in parallel
+        ready = asyncio.get_running_loop().create_future()
+        self._server_tasks[server_name] = asyncio.create_task(self._run_server(server_name, config, ready))
+        return await ready
+    
+    async def _run_server(self, server_name: str, config: Dict[str, Any], ready: asyncio.Future):
+        """Hold one MCP server connection open until close() is called."""
+        try:
+            # Validate command
+            command = config.get('command')
+            if not command:
+                raise ValueError(f"No command specified for {server_name}")
+            
+            # Create server parameters
+            params = StdioServerParameters(
+                command=command,
+                args=config.get('args', []),
+                env=config.get('env')
+            )
+            
+            async with stdio_client(params) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    init_result = await session.initialize()
+                    server_info = init_result.serverInfo
+                    self._server_info[server_name] = [server_info.name, server_info.version]
+                    
+                    # Discover tools (skipped when the warm catalog has this server
+                    # at the same name and version)
+                    server_tools = self._cached_tools(server_name)
+                    if server_tools is not None:
+                        logger.info(f"  [OK] {server_name}: {len(server_tools)} tools loaded from cache")
+                    else:
+                        tools_response = await session.list_tools()
+                        logger.info(f"  [OK] {server_name}: {len(tools_response.tools)} tools discovered")
+                        server_tools = []
+                        for tool in tools_response.tools:
+                            server_tools.append(self._convert_to_claude_format(tool, server_name))
+                            logger.debug(f"    - {tool.name}")
+                    
+                    # Store session
+                    self.sessions[server_name] = session
+                    ready.set_result(server_tools)
+                    
+                    await self._stop_event.wait()
         
-        logger.info(f"  [OK] {server_name}: {len(server_tools)} tools discovered")
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.error(f"  [X] {server_name} connection error: {e}")
         
-        # Convert and store tools
-        for tool in server_tools:
-            claude_tool = self._convert_to_claude_format(tool, server_name)
-            self.tools.append(claude_tool)
-            logger.debug(f"    - {tool.name}")
+        finally:
+            self.sessions.pop(server_name, None)
+    
+    def _config_hash(self) -> str:
+        """Stable hash of the server configs, used to key the tool catalog cache."""
+        blob = _json_dumps(self.server_configs, sort_keys=True)
+        return hashlib.blake2b(blob, digest_size=16).hexdigest()
+    
+    def _load_catalog(self, catalog_path: Path, config_file: Path) -> Dict[str, Dict[str, Any]]:
+        """Load a cached tool catalog if it is newer than the config file and within its TTL."""
+        try:
+            catalog_mtime = catalog_path.stat().st_mtime
+            if catalog_mtime <= config_file.stat().st_mtime or time.time() - catalog_mtime > TOOL_CATALOG_TTL:
+                return {}
+            return _json_loads(catalog_path.read_bytes())
+        except (OSError, ValueError):
+            return {}
+    
+    def _cached_tools(self, server_name: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached tools for a server, or None if it now reports a different serverInfo."""
+        entry = self._cached_catalog.get(server_name)
+        if not isinstance(entry, dict) or entry.get("server_info") != self._server_info.get(server_name):
+            return None
+        return entry.get("tools")
+    
+    def _save_catalog(self, catalog_path: Path):
+        """Write the discovered tools, grouped by server with its serverInfo, to the catalog cache."""
+        catalog: Dict[str, Dict[str, Any]] = {
+            name: {"server_info": self._server_info.get(name), "tools": []} for name in self.sessions
+        }
+        for tool in self.tools:
+            if tool["_mcp_server"] in catalog:
+                catalog[tool["_mcp_server"]]["tools"].append(tool)
+        try:
+            catalog_path.parent.mkdir(parents=True, exist_ok=True)
+            catalog_path.write_bytes(_json_dumps(catalog))
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write tool catalog cache: {e}")
     
     def _convert_to_claude_format(self, mcp_tool: Any, server_name: str) -> Dict[str, Any]:
         """Convert MCP tool to Claude API format."""
@@ -116,38 +229,62 @@ class MCPToolsManager:
             "description": mcp_tool.description or f"Tool: {mcp_tool.name}",
             "input_schema": mcp_tool.inputSchema,
             "_mcp_server": server_name,  # Internal tracking
-            "_original_name": mcp_tool.name  # Keep original for execution
+            "_original_name": mcp_tool.name,  # Keep original for execution
+            "_parallel_safe": self._is_read_only(mcp_tool)
         }
     
+    def _is_read_only(self, mcp_tool: Any) -> bool:
+        """Decide whether a tool can run alongside other calls in the same turn."""
+        # Prefer the server's own annotation when it provides one
+        annotations = getattr(mcp_tool, "annotations", None)
+        read_only = getattr(annotations, "readOnlyHint", None)
+        if read_only is not None:
+            return read_only
+        return mcp_tool.name.lower().startswith(self.CACHEABLE_PREFIXES)
+    
+    def is_parallel_safe(self, tool_name: str) -> bool:
+        """Whether a tool (by Claude-facing name) only reads state."""
+        tool = self._tool_index.get(tool_name)
+        if tool is None:
+            return False
+        # Catalogs cached before _parallel_safe existed fall back to the name
+        return tool.get("_parallel_safe", tool["_original_name"].lower().startswith(self.CACHEABLE_PREFIXES))
+    
     def get_tools_for_claude(self) -> List[Dict[str, Any]]:
         """Get tools in Claude API format (without internal metadata)."""
-        return [
-            {
-                "name": tool["name"],
-                "description": tool["description"],
-                "input_schema": tool["input_schema"]
-            }
-            for tool in self.tools
-        ]
+        # Built once and sorted by name so the schema sent to Claude is
+        # byte-identical across calls (keeps prompt caching effective)
+        if self._claude_tools is None:
+            self._claude_tools = [
+                {
+                    "name": tool["name"],
+                    "description": tool["description"],
+                    "input_schema": tool["input_schema"]
+                }
+                for tool in sorted(self.tools, key=lambda t: t["name"])
+            ]
+        return self._claude_tools
     
     async def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """Execute a tool via MCP."""
         # Find server for this tool
-        server_name = None
-        original_name = None
-        
-        for tool in self.tools:
-            if tool['name'] == tool_name:
-                server_name = tool.get('_mcp_server')
-                original_name = tool.get('_original_name', tool_name)
-                break
+        tool = self._tool_index.get(tool_name)
+        server_name = tool.get('_mcp_server') if tool else None
         
         if not server_name:
             raise ValueError(f"Tool not found: {tool_name}")
         
+        original_name = tool.get('_original_name', tool_name)
+        
         if server_name not in self.sessions:
             raise ValueError(f"Server not connected: {server_name}")
         
+        cache_key = self._cache_key(server_name, original_name, arguments)
+        if cache_key is not None and cache_key in self.tool_cache:
+            self.tool_cache.move_to_end(cache_key)
+            logger.info(f"Cache hit: {tool_name} on {server_name}")
+            return self.tool_cache[cache_key]
+        
         logger.info(f"Executing: {tool_name} (original: {original_name}) on {server_name}")
         logger.debug(f"  Arguments: {arguments}")
         
@@ -155,45 +292,61 @@ class MCPToolsManager:
         session = self.sessions[server_name]
         result = await session.call_tool(original_name, arguments)
         
+        if cache_key is not None and self._is_cacheable_result(result):
+            self.tool_cache[cache_key] = result
+            if len(self.tool_cache) > self.tool_cache_size:
+                self.tool_cache.popitem(last=False)
+        
         # Extract result
-        if hasattr(result, 'content') and result.content:
-            result_text = result.content[0].text
-        else:
-            result_text = str(result)
+        content = getattr(result, 'content', None)
+        result_text = content[0].text if content else str(result)
         
         logger.debug(f"  Result: {result_text[:200]}...")
         
         return result
     
+    def _cache_key(self, server_name: str, original_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """Return the result cache key for a call, or None if it must not be cached."""
+        if not self.enable_tool_caching or not original_name.lower().startswith(self.CACHEABLE_PREFIXES):
+            return None
+        try:
+            args_blob = _json_dumps(arguments, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return f"mcp_{server_name}_{original_name}_{hashlib.blake2b(args_blob).hexdigest()}"
+    
+    def _is_cacheable_result(self, result: Any) -> bool:
+        """Skip errors and results the server marked with cache_hint=no-cache."""
+        if getattr(result, 'isError', False):
+            return False
+        meta = getattr(result, 'meta', None) or {}
+        return meta.get('cache_hint') != 'no-cache'
+    
     def get_tool_info(self, tool_name: str) -> Optional[Dict[str, Any]]:
         """Get information about a specific tool."""
-        for tool in self.tools:
-            if tool['name'] == tool_name:
-                return tool
-        return None
+        return self._tool_index.get(tool_name)
     
     async def close(self):
         """Close all MCP connections."""
         logger.info("Closing MCP Tools Manager...")
         
-        # Close sessions
-        for server_name, session in self.sessions.items():
-            try:
-                await session.__aexit__(None, None, None)
-                logger.debug(f"  [OK] Closed: {server_name}")
-            except Exception as e:
-                logger.error(f"  [X] Error closing {server_name}: {e}")
+        # Signal every connection task to leave its contexts, then wait for them
+        if self._stop_event:
+            self._stop_event.set()
         
-        # Close stdio contexts
-        for context, read_stream, write_stream in self._stdio_contexts:
-            try:
-                await context.__aexit__(None, None, None)
-            except Exception:
-                pass
+        results = await asyncio.gather(*self._server_tasks.values(), return_exceptions=True)
+        for server_name, result in zip(self._server_tasks, results):
+            if isinstance(result, BaseException):
+                logger.error(f"  [X] Error closing {server_name}: {result}")
+            else:
+                logger.debug(f"  [OK] Closed: {server_name}")
         
         self.sessions.clear()
         self.tools.clear()
-        self._stdio_contexts.clear()
+        self._tool_index.clear()
+        self._claude_tools = None
+        self.tool_cache.clear()
+        self._server_tasks.clear()
         logger.info("[OK] MCP Tools Manager closed")
 
 
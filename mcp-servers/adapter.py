@@ -1,15 +1,28 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from typing import Dict, Any
-import requests
+import httpx
 import time
 
 ULTIMATE_WEBHOOK_URL = "http://localhost:18788/webhook"
 
-app = FastAPI(title="OpenClaw → ULTIMATE Adapter (GOD MODE)", version="1.3.0")
+# Shared keep-alive client, opened and closed with the app
+client: httpx.AsyncClient = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client
+    client = httpx.AsyncClient(timeout=600, limits=httpx.Limits(max_keepalive_connections=20))
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+app = FastAPI(title="OpenClaw → ULTIMATE Adapter (GOD MODE)", version="1.3.0", lifespan=lifespan)
 
 @app.post("/responses")
-def openclaw_responses(payload: Dict[str, Any]):
+async def openclaw_responses(payload: Dict[str, Any]):
     """
     Accepts OpenClaw's complex nested payload and forwards to ULTIMATE /webhook.
     """
@@ -53,7 +66,7 @@ def openclaw_responses(payload: Dict[str, Any]):
     }
 
     try:
-        resp = requests.post(ULTIMATE_WEBHOOK_URL, json=body, timeout=600)
+        resp = await client.post(ULTIMATE_WEBHOOK_URL, json=body)
     except Exception as e:
         print(f"❌ Connection error: {e}")
         raise HTTPException(status_code=502, detail=f"ULTIMATE connection failed: {e}")
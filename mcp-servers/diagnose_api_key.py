@@ -5,6 +5,7 @@ Shows where OpenClaw is reading the Anthropic API key from
 """
 
 import os
+import re
 import sys
 from pathlib import Path
 
@@ -37,34 +38,39 @@ locations = [
     os.getcwd(),  # Current dir
 ]
 
+# Canonicalize once so the same directory is never scanned twice
+search_dirs = list(dict.fromkeys(Path(loc).resolve() for loc in locations))
+
+# Horizontal whitespace only, so an empty value never runs onto the next line
+# (a trailing \r from CRLF files is dropped too)
+API_KEY_LINE = re.compile(rb'^(?:export[ \t]+)?ANTHROPIC_API_KEY[ \t]*=[ \t]*(.*?)[ \t\r]*$', re.M)
+
 found_env_files = []
 
-for loc in locations:
+for directory in search_dirs:
+    env_path = directory / ".env"
+    if not env_path.is_file():
+        continue
+    abs_path = str(env_path)
+    found_env_files.append(abs_path)
+    print(f"   ✓ Found: {abs_path}")
+
+    # Read and check for ANTHROPIC_API_KEY
     try:
-        env_path = os.path.join(str(loc), ".env")
-        if os.path.exists(env_path):
-            abs_path = os.path.abspath(env_path)
-            if abs_path not in found_env_files:
-                found_env_files.append(abs_path)
-                print(f"   ✓ Found: {abs_path}")
-
-                # Read and check for ANTHROPIC_API_KEY
-                try:
-                    with open(env_path, 'r', encoding='utf-8') as f:
-                        for line_num, line in enumerate(f, 1):
-                            if 'ANTHROPIC_API_KEY' in line:
-                                # Mask the key
-                                if '=' in line:
-                                    key_part = line.split('=', 1)[1].strip().strip('"').strip("'")
-                                    if key_part:
-                                        print(f"     Line {line_num}: ANTHROPIC_API_KEY={key_part[:20]}...{key_part[-4:]}")
-                                        print(f"     Length: {len(key_part)} chars")
-                                    else:
-                                        print(f"     Line {line_num}: ANTHROPIC_API_KEY is EMPTY!")
-                except Exception as e:
-                    print(f"     Error reading file: {e}")
-    except Exception as e:
-        pass
+        data = env_path.read_bytes()
+    except OSError as e:
+        print(f"     Error reading file: {e}")
+        continue
+
+    for match in API_KEY_LINE.finditer(data):
+        line_num = data.count(b"\n", 0, match.start()) + 1
+        # Mask the key
+        key_part = match.group(1).decode("utf-8", errors="replace").strip('"').strip("'")
+        if key_part:
+            print(f"     Line {line_num}: ANTHROPIC_API_KEY={key_part[:20]}...{key_part[-4:]}")
+            print(f"     Length: {len(key_part)} chars")
+        else:
+            print(f"     Line {line_num}: ANTHROPIC_API_KEY is EMPTY!")
 
 if not found_env_files:
     print(f"   ✗ No .env files found in searched locations")
@@ -4,17 +4,79 @@ MCP Server Stdio Diagnostic Tool
 Tests MCP servers to find exactly where stdout pollution occurs
 """
 
-import subprocess
+import asyncio
 import json
+import os
 import sys
-import time
 from datetime import datetime
+from itertools import islice
+from pathlib import Path
 
-def log(msg):
-    """Print timestamped log to stderr"""
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", file=sys.stderr)
+try:
+    import orjson  # Optional: faster JSON-RPC framing
+except ImportError:
+    orjson = None
 
-def test_mcp_server(server_script, test_name="Test"):
+def _json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def _json_dumps(obj):
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
+# The handshake is identical for every server, so frame it once at import:
+# initialize, the initialized notification (which gets no reply), then tools/list
+HANDSHAKE_FRAMES = b"".join(_json_dumps(message) + b"\n" for message in (
+    {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "initialize",
+        "params": {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "diagnostic-client", "version": "1.0.0"}
+        }
+    },
+    {"jsonrpc": "2.0", "method": "notifications/initialized"},
+    {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+))
+
+# Side-effect-free tools to call in phase 4 (matched by name, first kind wins)
+# and the arguments to call them with; shared across runs, never mutated
+SAFE_TEST_TOOLS = {
+    "wait": {"seconds": 0.1},
+    "snapshot": {"use_vision": False},
+}
+
+# Upper bound on any single wait for a server response
+READ_TIMEOUT = 10.0
+
+# Pipe reader buffer; also caps the longest JSON-RPC line (asyncio defaults to 64 KiB)
+STREAM_LIMIT = 1 << 20
+
+# MCP_DIAG_QUIET=1 turns the per-step log off; the summary is still printed
+QUIET = os.environ.get("MCP_DIAG_QUIET") == "1"
+
+# Log lines waiting to be written to stderr in one go
+_log_buffer = []
+
+def flush_log():
+    """Write any buffered log lines to stderr"""
+    if _log_buffer:
+        sys.stderr.write("".join(_log_buffer))
+        sys.stderr.flush()
+        _log_buffer.clear()
+
+if QUIET:
+    def log(msg):
+        """Per-step logging is disabled by MCP_DIAG_QUIET"""
+else:
+    def log(msg):
+        """Buffer a timestamped log line for stderr"""
+        _log_buffer.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}\n")
+        if len(_log_buffer) >= 32:
+            flush_log()
+
+async def test_mcp_server(server_script, test_name="Test"):
     """
     Test an MCP server and capture ALL output to diagnose pollution
     Returns: (success, diagnostics_dict)
@@ -32,32 +94,26 @@ def test_mcp_server(server_script, test_name="Test"):
         "errors": []
     }
     
+    proc = None
+    stderr_task = None
     try:
-        log("Starting MCP server process...")
-        proc = subprocess.Popen(
-            ["python", server_script],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
+        log(f"[{test_name}] Starting MCP server process...")
+        proc = await asyncio.create_subprocess_exec(
+            "python", server_script,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT
         )
         
         diagnostics["phases"]["process_started"] = True
-        log("✓ Process started")
+        log(f"[{test_name}] ✓ Process started")
         
-        # Give it a moment to crash if it's going to
-        time.sleep(0.5)
-        if proc.poll() is not None:
-            diagnostics["errors"].append(f"Process crashed immediately with code {proc.returncode}")
-            stderr = proc.stderr.read()
-            diagnostics["raw_outputs"]["stderr_on_crash"] = stderr
-            log(f"✗ Process crashed! Return code: {proc.returncode}")
-            log(f"Stderr: {stderr[:500]}")
-            return False, diagnostics
+        # Drain stderr from the start so a chatty server can't stall on a full pipe
+        stderr_task = asyncio.ensure_future(proc.stderr.read())
         
-        def send_jsonrpc(method, params=None, req_id=1):
-            """Send JSON-RPC request and try to read response"""
+        def encode_jsonrpc(method, params=None, req_id=1):
+            """Frame a JSON-RPC request as one newline-terminated line"""
             request = {
                 "jsonrpc": "2.0",
                 "id": req_id,
@@ -66,149 +122,159 @@ def test_mcp_server(server_script, test_name="Test"):
             if params:
                 request["params"] = params
             
-            request_json = json.dumps(request)
-            log(f"→ Sending: {method} (id={req_id})")
-            
+            return _json_dumps(request) + b"\n"
+        
+        async def write_frames(frames, what):
+            """Write one or more framed messages with a single drain"""
             try:
-                proc.stdin.write(request_json + "\n")
-                proc.stdin.flush()
-            except Exception as e:
-                diagnostics["errors"].append(f"Failed to send {method}: {str(e)}")
-                log(f"✗ Failed to send: {e}")
-                return None
-            
-            # Try to read response
+                proc.stdin.write(frames)
+                await proc.stdin.drain()
+                return True
+            except OSError as e:
+                diagnostics["errors"].append(f"Failed to send {what}: {str(e)}")
+                log(f"[{test_name}] ✗ Failed to send: {e}")
+                return False
+        
+        async def read_response(method):
+            """Read the next response line and check it is valid JSON"""
             try:
-                log("  Waiting for response...")
-                response_line = proc.stdout.readline()
+                log(f"[{test_name}]   Waiting for response...")
+                flush_log()
+                try:
+                    response_line = await asyncio.wait_for(proc.stdout.readline(), READ_TIMEOUT)
+                except asyncio.TimeoutError:
+                    diagnostics["errors"].append(f"No response for {method} (read timeout after {READ_TIMEOUT}s)")
+                    log(f"[{test_name}] ✗ No response (read timeout)")
+                    return None
                 
                 if not response_line:
                     diagnostics["errors"].append(f"No response for {method} (EOF)")
-                    log("✗ No response (EOF)")
+                    log(f"[{test_name}] ✗ No response (EOF)")
                     return None
                 
                 # Check if it's valid JSON
                 try:
-                    response = json.loads(response_line)
-                    log(f"✓ Got valid JSON response ({len(response_line)} bytes)")
+                    response = _json_loads(response_line)
+                    log(f"[{test_name}] ✓ Got valid JSON response ({len(response_line)} bytes)")
                     return response
-                except json.JSONDecodeError as je:
+                except ValueError as je:
+                    # Pipes stay binary; only decode when we need to show the bytes
+                    bad_line = response_line.decode("utf-8", errors="replace")
                     diagnostics["errors"].append(f"Invalid JSON response for {method}: {str(je)}")
-                    diagnostics["raw_outputs"][f"bad_response_{method}"] = response_line[:200]
-                    log(f"✗ Invalid JSON: {str(je)}")
-                    log(f"  First 200 chars: {repr(response_line[:200])}")
+                    diagnostics["raw_outputs"][f"bad_response_{method}"] = bad_line[:200]
+                    log(f"[{test_name}] ✗ Invalid JSON: {str(je)}")
+                    log(f"[{test_name}]   First 200 chars: {repr(bad_line[:200])}")
                     
                     # Try to read any additional garbage
                     try:
-                        proc.stdout.settimeout(0.5)
-                        extra = proc.stdout.read(1000)
+                        extra = await asyncio.wait_for(proc.stdout.read(1000), 0.5)
                         if extra:
+                            extra = extra.decode("utf-8", errors="replace")
                             diagnostics["raw_outputs"][f"extra_output_{method}"] = extra[:500]
-                            log(f"  Extra output found: {repr(extra[:200])}")
-                    except:
+                            log(f"[{test_name}]   Extra output found: {repr(extra[:200])}")
+                    except asyncio.TimeoutError:
                         pass
                     
                     return None
-                    
+            
             except Exception as e:
                 diagnostics["errors"].append(f"Error reading response for {method}: {str(e)}")
-                log(f"✗ Error reading response: {e}")
+                log(f"[{test_name}] ✗ Error reading response: {e}")
+                return None
+        
+        async def send_jsonrpc(method, params=None, req_id=1):
+            """Send JSON-RPC request and try to read response"""
+            log(f"[{test_name}] → Sending: {method} (id={req_id})")
+            if not await write_frames(encode_jsonrpc(method, params, req_id), method):
                 return None
+            return await read_response(method)
+        
+        # Phases 1-3 go out in one write
+        log(f"[{test_name}] → Sending: initialize (id=1), notifications/initialized, tools/list (id=2)")
+        sent = await write_frames(HANDSHAKE_FRAMES, "initialize")
         
         # Test 1: Initialize
-        log("\n--- Phase 1: Initialize ---")
-        response = send_jsonrpc("initialize", {
-            "protocolVersion": "2024-11-05",
-            "capabilities": {},
-            "clientInfo": {"name": "diagnostic-client", "version": "1.0.0"}
-        })
+        log(f"\n[{test_name}] --- Phase 1: Initialize ---")
+        response = await read_response("initialize") if sent else None
         
         if response and "result" in response:
             diagnostics["phases"]["initialize"] = True
             server_info = response["result"].get("serverInfo", {})
-            log(f"✓ Initialize successful")
-            log(f"  Server: {server_info.get('name', 'unknown')}")
+            log(f"[{test_name}] ✓ Initialize successful")
+            log(f"[{test_name}]   Server: {server_info.get('name', 'unknown')}")
         else:
             diagnostics["phases"]["initialize"] = False
-            log("✗ Initialize failed")
+            log(f"[{test_name}] ✗ Initialize failed")
+            # No up-front sleep to catch startup crashes; check for one only now that
+            # the handshake failed, once the closed pipes say the child is gone
+            try:
+                await asyncio.wait_for(proc.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass  # Still alive
+            else:
+                diagnostics["errors"].append(f"Process crashed immediately with code {proc.returncode}")
+                stderr = (await stderr_task).decode("utf-8", errors="replace")
+                diagnostics["raw_outputs"]["stderr_on_crash"] = stderr
+                log(f"[{test_name}] ✗ Process crashed! Return code: {proc.returncode}")
+                log(f"[{test_name}] Stderr: {stderr[:500]}")
             # Don't continue if initialize fails
-            proc.terminate()
             return False, diagnostics
         
-        # Test 2: Send initialized notification
-        log("\n--- Phase 2: Initialized notification ---")
-        notification = {"jsonrpc": "2.0", "method": "notifications/initialized"}
-        try:
-            proc.stdin.write(json.dumps(notification) + "\n")
-            proc.stdin.flush()
-            diagnostics["phases"]["initialized_notification"] = True
-            log("✓ Notification sent")
-        except Exception as e:
-            diagnostics["phases"]["initialized_notification"] = False
-            diagnostics["errors"].append(f"Failed to send notification: {str(e)}")
-            log(f"✗ Failed: {e}")
+        # Test 2: Initialized notification (already written with the batch)
+        log(f"\n[{test_name}] --- Phase 2: Initialized notification ---")
+        diagnostics["phases"]["initialized_notification"] = True
+        log(f"[{test_name}] ✓ Notification sent")
         
         # Test 3: List tools
-        log("\n--- Phase 3: List tools ---")
-        response = send_jsonrpc("tools/list", request_id=2)
+        log(f"\n[{test_name}] --- Phase 3: List tools ---")
+        response = await read_response("tools/list")
         
         if response and "result" in response:
             tools = response["result"].get("tools", [])
-            diagnostics["phases"]["list_tools"] = len(tools)
-            log(f"✓ List tools successful: {len(tools)} tools found")
-            for i, tool in enumerate(tools[:3], 1):
-                log(f"  {i}. {tool['name']}")
-            if len(tools) > 3:
-                log(f"  ... and {len(tools)-3} more")
+            tool_count = len(tools)
+            diagnostics["phases"]["list_tools"] = tool_count
+            log(f"[{test_name}] ✓ List tools successful: {tool_count} tools found")
+            for i, tool in enumerate(islice(tools, 3), 1):
+                log(f"[{test_name}]   {i}. {tool['name']}")
+            if tool_count > 3:
+                log(f"[{test_name}]   ... and {tool_count-3} more")
         else:
             diagnostics["phases"]["list_tools"] = 0
-            log("✗ List tools failed")
+            log(f"[{test_name}] ✗ List tools failed")
         
         # Test 4: Call a tool (if available)
         if diagnostics["phases"].get("list_tools", 0) > 0:
-            log("\n--- Phase 4: Call tool ---")
+            log(f"\n[{test_name}] --- Phase 4: Call tool ---")
             
-            # Find a safe tool to test
-            test_tool = None
-            for tool in tools:
-                if "wait" in tool["name"].lower():
-                    test_tool = tool
-                    break
-                if "snapshot" in tool["name"].lower():
-                    test_tool = tool
-                    break
+            # Find a safe tool to test, in SAFE_TEST_TOOLS order of preference
+            test_kind, test_tool = next(
+                ((kind, tool) for kind in SAFE_TEST_TOOLS for tool in tools if kind in tool["name"].lower()),
+                (None, None)
+            )
             
             if test_tool:
-                log(f"Testing tool: {test_tool['name']}")
-                
-                # Prepare arguments based on tool
-                if "wait" in test_tool["name"].lower():
-                    args = {"seconds": 0.1}
-                elif "snapshot" in test_tool["name"].lower():
-                    args = {"use_vision": False}
-                else:
-                    args = {}
+                log(f"[{test_name}] Testing tool: {test_tool['name']}")
                 
-                response = send_jsonrpc("tools/call", {
+                response = await send_jsonrpc("tools/call", {
                     "name": test_tool["name"],
-                    "arguments": args
-                }, request_id=3)
+                    "arguments": SAFE_TEST_TOOLS[test_kind]
+                }, req_id=3)
                 
                 if response and "result" in response:
                     diagnostics["phases"]["call_tool"] = True
-                    log("✓ Tool call successful")
+                    log(f"[{test_name}] ✓ Tool call successful")
                     content = response["result"].get("content", [])
                     if content and len(content) > 0:
                         first_content = content[0]
                         if first_content.get("type") == "text":
-                            log(f"  Result: {first_content.get('text', '')[:100]}")
+                            log(f"[{test_name}]   Result: {first_content.get('text', '')[:100]}")
                         elif first_content.get("type") == "image":
-                            log(f"  Result: Image returned ({len(first_content.get('data', ''))} bytes)")
+                            log(f"[{test_name}]   Result: Image returned ({len(first_content.get('data', ''))} bytes)")
                 else:
                     diagnostics["phases"]["call_tool"] = False
-                    log("✗ Tool call failed")
+                    log(f"[{test_name}] ✗ Tool call failed")
             else:
-                log("⊘ No safe tool found to test")
+                log(f"[{test_name}] ⊘ No safe tool found to test")
         
         # All tests passed
         diagnostics["success"] = all([
@@ -217,32 +283,45 @@ def test_mcp_server(server_script, test_name="Test"):
         ])
         
         if diagnostics["success"]:
-            log("\n✅ ALL TESTS PASSED")
+            log(f"\n[{test_name}] ✅ ALL TESTS PASSED")
         else:
-            log("\n❌ SOME TESTS FAILED")
+            log(f"\n[{test_name}] ❌ SOME TESTS FAILED")
         
         return diagnostics["success"], diagnostics
-        
+    
     except Exception as e:
         diagnostics["errors"].append(f"Test exception: {str(e)}")
-        log(f"\n✗ Test failed with exception: {e}")
+        log(f"\n[{test_name}] ✗ Test failed with exception: {e}")
+        flush_log()
         import traceback
         traceback.print_exc()
         return False, diagnostics
-        
+    
     finally:
-        try:
-            proc.terminate()
-            proc.wait(timeout=2)
-            log("\nServer process terminated")
-        except:
+        if proc is not None and proc.returncode is None:
             try:
-                proc.kill()
-            except:
-                pass
+                proc.terminate()
+                await asyncio.wait_for(proc.wait(), 2)
+                log(f"\n[{test_name}] Server process terminated")
+            except asyncio.TimeoutError:
+                try:
+                    proc.kill()
+                    await proc.wait()
+                except ProcessLookupError:
+                    pass
+            except ProcessLookupError:
+                pass  # Exited on its own in the meantime
+        if stderr_task is not None and not stderr_task.done():
+            stderr_task.cancel()
 
-def main():
+async def main():
     """Run diagnostics on available MCP servers"""
+    # Keep our stderr lines ordered against the children's when redirected
+    try:
+        sys.stderr.reconfigure(line_buffering=True, write_through=True)
+    except AttributeError:
+        pass  # Replaced by a stream without reconfigure()
+    
     print("=" * 70, file=sys.stderr)
     print("MCP SERVER STDIO DIAGNOSTIC TOOL", file=sys.stderr)
     print("=" * 70, file=sys.stderr)
@@ -253,17 +332,21 @@ def main():
         ("windows_mcp_server.py", "Original Windows Server"),
     ]
     
-    results = []
+    # Stat every candidate once up front to build the test plan
+    present = {server_file: Path(server_file).is_file() for server_file, _ in servers_to_test}
+    plan = [(server_file, test_name) for server_file, test_name in servers_to_test if present[server_file]]
+    skipped = [server_file for server_file, is_file in present.items() if not is_file]
+    if skipped:
+        log(f"\n⊘ Skipping {', '.join(skipped)} (not found)")
     
-    for server_file, test_name in servers_to_test:
-        if not os.path.exists(server_file):
-            log(f"\n⊘ Skipping {server_file} (not found)")
-            continue
-        
-        success, diagnostics = test_mcp_server(server_file, test_name)
-        results.append((test_name, success, diagnostics))
-        
-        time.sleep(1)  # Brief pause between tests
+    # Probe every server concurrently; each one only waits on its own pipes
+    outcomes = await asyncio.gather(*(test_mcp_server(server_file, test_name) for server_file, test_name in plan))
+    results = [
+        (test_name, success, diagnostics)
+        for (_, test_name), (success, diagnostics) in zip(plan, outcomes)
+    ]
+    
+    flush_log()
     
     # Summary
     print("\n" + "=" * 70, file=sys.stderr)
@@ -295,5 +378,4 @@ def main():
         return 1
 
 if __name__ == "__main__":
-    import os
-    sys.exit(main())
+    sys.exit(asyncio.run(main()))
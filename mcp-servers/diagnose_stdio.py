@@ -6,6 +6,8 @@ Run this BEFORE the MCP server to find the issue
 
 import sys
 import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 print("=== STDIO Diagnostic Tool ===", file=sys.stderr)
 print(f"Python: {sys.version}", file=sys.stderr)
@@ -60,44 +62,40 @@ tool_modules = [
     "tools.app_tool",
 ]
 
-for module_name in tool_modules:
+def probe_import(module_name):
+    """Import a module in a fresh interpreter and capture what it writes"""
+    return subprocess.run(
+        [sys.executable, "-c", f"import {module_name}"],
+        capture_output=True,
+        text=True
+    )
+
+# Each probe runs in its own process, so stdout/stderr capture is isolated
+# and the imports proceed in parallel
+with ThreadPoolExecutor(max_workers=len(tool_modules)) as executor:
+    results = list(executor.map(probe_import, tool_modules))
+
+for module_name, result in zip(tool_modules, results):
     print(f"  Testing {module_name}...", file=sys.stderr)
     
-    # Capture what gets written to stdout
-    from io import StringIO
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        print(f"    ✗ Import failed: {error[-1] if error else result.returncode}", file=sys.stderr)
+        continue
     
-    old_stdout = sys.stdout
-    old_stderr = sys.stderr
+    out_content = result.stdout
+    err_content = result.stderr
     
-    capture_out = StringIO()
-    capture_err = StringIO()
+    if out_content:
+        print(f"    ⚠ STDOUT pollution detected:", file=sys.stderr)
+        print(f"      {repr(out_content[:100])}", file=sys.stderr)
     
-    sys.stdout = capture_out
-    sys.stderr = capture_err
+    if err_content:
+        print(f"    ⚠ STDERR pollution detected:", file=sys.stderr)
+        print(f"      {repr(err_content[:100])}", file=sys.stderr)
     
-    try:
-        __import__(module_name)
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-        
-        out_content = capture_out.getvalue()
-        err_content = capture_err.getvalue()
-        
-        if out_content:
-            print(f"    ⚠ STDOUT pollution detected:", file=sys.stderr)
-            print(f"      {repr(out_content[:100])}", file=sys.stderr)
-        
-        if err_content:
-            print(f"    ⚠ STDERR pollution detected:", file=sys.stderr)
-            print(f"      {repr(err_content[:100])}", file=sys.stderr)
-        
-        if not out_content and not err_content:
-            print(f"    ✓ Clean import", file=sys.stderr)
-            
-    except Exception as e:
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-        print(f"    ✗ Import failed: {e}", file=sys.stderr)
+    if not out_content and not err_content:
+        print(f"    ✓ Clean import", file=sys.stderr)
 
 print("", file=sys.stderr)
 print("=== Diagnostic Complete ===", file=sys.stderr)
@@ -8,7 +8,8 @@ import os
 import asyncio
 import json
 import logging
-import requests
+import time
+import httpx
 
 log_file = open(os.path.join(os.path.dirname(__file__), "enhanced_gw_mcp.log"), "a")
 sys.stderr = log_file
@@ -17,63 +18,97 @@ from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
 
+try:
+    import orjson  # Optional: faster encode/decode of gateway bodies
+except ImportError:
+    orjson = None
+
+def _json_loads(data: bytes):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def _json_dumps(obj) -> bytes:
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
 GATEWAY_URL = "http://localhost:18788"
+# How long a tools/list answer is reused before asking the gateway again
+TOOLS_TTL = float(os.environ.get("GATEWAY_TOOLS_TTL", "30"))
 logger = logging.getLogger("enhanced-gateway-mcp")
 logging.basicConfig(stream=log_file, level=logging.INFO)
 
 server = Server("enhanced-gateway")
 
-def fetch_tools():
+# Shared async client, opened for the lifetime of the stdio server
+client: httpx.AsyncClient = None
+
+# Parsed Tool objects from the last successful fetch, keyed by gateway URL
+_tools_cache = {}
+
+async def fetch_tools():
+    cached = _tools_cache.get(GATEWAY_URL)
+    if cached and time.monotonic() < cached["expires"]:
+        return cached["tools"]
     try:
-        resp = requests.get(f"{GATEWAY_URL}/tools", timeout=5)
-        data = resp.json()
-        return data.get("tools", [])
+        resp = await client.get(f"{GATEWAY_URL}/tools", timeout=5)
+        data = _json_loads(resp.content)
+        tools = [
+            Tool(
+                name=t["name"],
+                description=t.get("description", ""),
+                inputSchema=t.get("input_schema", {"type": "object", "properties": {}})
+            )
+            for t in data.get("tools", [])
+        ]
     except Exception as e:
         logger.error(f"Failed to fetch tools: {e}")
         return []
+    _tools_cache[GATEWAY_URL] = {"expires": time.monotonic() + TOOLS_TTL, "tools": tools}
+    return tools
 
-def call_tool_http(tool_name: str, arguments: dict):
+async def call_tool_http(tool_name: str, arguments: dict):
     try:
-        # Direct tool execution via responses endpoint
-        resp = requests.post(
+        # Direct tool execution via responses endpoint; model and messages
+        # stay because the gateway validates them as required fields
+        resp = await client.post(
             f"{GATEWAY_URL}/v1/responses",
-            json={
+            content=_json_dumps({
                 "model": "gpt-4",
                 "messages": [{"role": "user", "content": f"Execute: {tool_name}"}],
                 "_direct_tool_call": True,
                 "_tool_name": tool_name,
                 "_tool_args": arguments
-            },
-            timeout=60
+            }),
+            headers={"Content-Type": "application/json"}
         )
-        data = resp.json()
+        data = _json_loads(resp.content)
         if "choices" in data:
             msg = data["choices"][0].get("message", {})
-            return msg.get("content", json.dumps(data))
-        return json.dumps(data)
+            if "content" in msg:
+                return msg["content"]
+        return _json_dumps(data).decode()
     except Exception as e:
         return f"Error calling {tool_name}: {str(e)}"
 
 @server.list_tools()
 async def list_tools():
-    tools_data = fetch_tools()
-    tools = []
-    for t in tools_data:
-        tools.append(Tool(
-            name=t["name"],
-            description=t.get("description", ""),
-            inputSchema=t.get("input_schema", {"type": "object", "properties": {}})
-        ))
-    return tools
+    return await fetch_tools()
 
 @server.call_tool()
 async def call_tool_handler(name: str, arguments: dict):
-    result = call_tool_http(name, arguments)
+    result = await call_tool_http(name, arguments)
     return [TextContent(type="text", text=str(result))]
 
 async def main():
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, server.create_initialization_options())
+    global client
+    # Keep-alive pool so back-to-back tool calls reuse the gateway socket
+    client = httpx.AsyncClient(
+        timeout=60,
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=8, keepalive_expiry=60)
+    )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+    finally:
+        await client.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -4,8 +4,11 @@ Ollama Auto-Installer for OpenClaw
 Installs Ollama + DeepSeek-R1 8B + Configures OpenClaw
 """
 
+import io
 import os
+import socket
 import subprocess
+import sys
 import urllib.request
 import time
 import json
@@ -19,7 +22,17 @@ def download_ollama():
     output = "OllamaSetup.exe"
 
     try:
-        urllib.request.urlretrieve(url, output)
+        # 1 MiB reads instead of urlretrieve's 8 KiB blocks, with a running total
+        with urllib.request.urlopen(url, timeout=30) as resp, open(output, "wb") as f:
+            total = int(resp.headers.get("Content-Length") or 0)
+            done = 0
+            for chunk in iter(lambda: resp.read(1 << 20), b""):
+                f.write(chunk)
+                done += len(chunk)
+                if total:
+                    print(f"\r   {done >> 20}/{total >> 20} MB", end="", flush=True)
+            if total:
+                print()
         print(f"✓ Downloaded: {output}")
         return output
     except Exception as e:
@@ -46,21 +59,36 @@ def wait_for_ollama():
     """Wait for Ollama service to start"""
     print("\n⏳ Waiting for Ollama service to start...")
 
-    for i in range(30):
+    # Probe the API port directly (no process spawn), backing off 0.25s → 4s
+    deadline = time.monotonic() + 60
+    delay = 0.25
+    while time.monotonic() < deadline:
         try:
-            result = subprocess.run(
-                ["ollama", "list"], 
-                capture_output=True, 
-                timeout=5
-            )
-            if result.returncode == 0:
+            with socket.create_connection(("localhost", 11434), timeout=0.5):
                 print("✓ Ollama service is running!")
                 return True
-        except:
+        except OSError:
             pass
 
-        time.sleep(2)
-        print(f"   Waiting... ({i+1}/30)")
+        time.sleep(delay)
+        delay = min(delay * 1.6, 4.0)
+        print(f"   Waiting... ({int(deadline - time.monotonic())}s left)")
+
+    # One CLI check for a clearer diagnosis before giving up
+    try:
+        result = subprocess.run(
+            ["ollama", "list"],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        if result.returncode == 0:
+            print("✓ Ollama service is running!")
+            return True
+        if result.stderr:
+            print(f"   {result.stderr.strip()}")
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"   ollama list failed: {e}")
 
     print("⚠ Ollama may need manual start")
     return False
@@ -71,13 +99,43 @@ def pull_model(model_name):
     print("   (This may take 5-10 minutes)")
 
     try:
-        subprocess.run(["ollama", "pull", model_name], check=True)
+        # Relay output as it arrives; read1 keeps the \r-redrawn progress bar live
+        with subprocess.Popen(
+            ["ollama", "pull", model_name],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=io.DEFAULT_BUFFER_SIZE
+        ) as proc:
+            for chunk in iter(lambda: proc.stdout.read1(io.DEFAULT_BUFFER_SIZE), b""):
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.flush()
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
         print(f"✓ {model_name} downloaded!")
         return True
     except Exception as e:
         print(f"❌ Model download failed: {e}")
         return False
 
+# Parsed openclaw.json and the exact text it was read from, keyed by path
+_config_cache = {}
+
+def _load_config(config_path):
+    """Load a config file once and keep the parsed dict"""
+    if config_path not in _config_cache:
+        text = config_path.read_text() if config_path.exists() else ""
+        _config_cache[config_path] = (json.loads(text) if text.strip() else {}, text)
+    return _config_cache[config_path][0]
+
+def _save_config(config_path, config):
+    """Write a config file only if its serialized form changed"""
+    text = json.dumps(config, indent=2)
+    if text == _config_cache.get(config_path, (None, None))[1]:
+        return False
+    config_path.write_text(text)
+    _config_cache[config_path] = (config, text)
+    return True
+
 def configure_openclaw(model_name):
     """Update OpenClaw configuration"""
     print(f"\n⚙️ Configuring OpenClaw to use {model_name}...")
@@ -89,11 +147,7 @@ def configure_openclaw(model_name):
         config_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Load existing config or create new
-        if config_path.exists():
-            with open(config_path, 'r') as f:
-                config = json.load(f)
-        else:
-            config = {}
+        config = _load_config(config_path)
 
         # Update gateway config
         if "gateway" not in config:
@@ -102,11 +156,11 @@ def configure_openclaw(model_name):
         config["gateway"]["agentModel"] = f"ollama/{model_name}"
         config["gateway"]["baseURL"] = "http://localhost:11434"
 
-        # Save config
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=2)
-
-        print(f"✓ OpenClaw configured!")
+        # Save config (skipped when nothing changed)
+        if _save_config(config_path, config):
+            print(f"✓ OpenClaw configured!")
+        else:
+            print(f"✓ OpenClaw already configured")
         print(f"   Config: {config_path}")
         return True
 
@@ -2,8 +2,19 @@
 Agent Loop - Orchestrates the agentic workflow with tool execution
 """
 import asyncio
+import base64
+import io
+import json
 import logging
-from typing import List, Dict, Any, Optional, TYPE_CHECKING
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Tuple, TYPE_CHECKING
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
 
 if TYPE_CHECKING:
     from lib.claude_client import ClaudeClient
@@ -11,16 +22,65 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+SCREENSHOT_MAX_EDGE = 1568  # Longest side Claude looks at without resizing itself
+SCREENSHOT_JPEG_QUALITY = 80
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _call_key(tool_name: str, tool_input: Dict[str, Any]) -> Tuple[str, str]:
+    """Identity of a tool call, so repeated read-only calls in a turn can share one result."""
+    return tool_name, json.dumps(tool_input, sort_keys=True)
+
+
+def _shrink_screenshot(data: str, media_type: str) -> Tuple[str, str]:
+    """
+    Downscale a base64 screenshot and re-encode it as JPEG.
+    
+    Runs in a worker process so PNG decoding doesn't stall the event loop.
+    Returns the original image if re-encoding doesn't make it smaller.
+    """
+    image = Image.open(io.BytesIO(base64.b64decode(data)))
+    image.thumbnail((SCREENSHOT_MAX_EDGE, SCREENSHOT_MAX_EDGE), Image.Resampling.LANCZOS)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=SCREENSHOT_JPEG_QUALITY)
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+    if len(encoded) >= len(data):
+        return data, media_type
+    return encoded, "image/jpeg"
+
 
 class AgentLoop:
     """
     Manages the agentic loop: prompt → Claude → tools → results → repeat
     """
     
-    def __init__(self, claude_client, mcp_manager):
+    def __init__(
+        self,
+        claude_client,
+        mcp_manager,
+        terminate_when: Optional[Callable[[List[Dict[str, Any]]], bool]] = None
+    ):
+        """
+        Args:
+            claude_client: Client used to talk to Claude
+            mcp_manager: Manager that executes tool calls
+            terminate_when: Optional check on each turn's tool results; when it
+                returns True the loop ends with Claude's text from that turn
+                instead of sending the results back for another reply
+        """
         self.claude = claude_client
         self.mcp = mcp_manager
+        self.terminate_when = terminate_when
         self.max_iterations = 25  # Prevent infinite loops
+        self.max_parallel_tools = 4  # Concurrent MCP calls per turn
+        self._tool_sem = asyncio.Semaphore(self.max_parallel_tools)  # Shared by every turn and early start
+        self.max_history_images = 3  # Screenshots kept in the transcript
+        self.image_prune_slack = 5  # Extra screenshots allowed before a prune (see _prune_images)
+        self._log_buf: List[str] = []  # Verbose lines, written once per iteration
         self.system_prompt = (
             "You are a helpful AI assistant with access to Windows automation tools. "
             "You can control the computer, run commands, and help users accomplish tasks.\n\n"
@@ -42,6 +102,11 @@ class AgentLoop:
             
             "When a task is complete, provide a clear summary of what was accomplished."
         )
+        
+        # The system prompt never changes, so let the API cache it with the tools
+        self._system_blocks = [{"type": "text", "text": self.system_prompt, "cache_control": {"type": "ephemeral"}}]
+        self._tools = self.mcp.get_claude_tools()
+        self._tools_version = self.mcp.tools_version
     
     async def run(
         self,
@@ -64,8 +129,10 @@ class AgentLoop:
         messages = conversation_history or []
         messages.append({"role": "user", "content": user_message})
         
-        # Get available tools
-        tools = self.mcp.get_claude_tools()
+        # Rebuild the tools payload only if the MCP servers changed since last run
+        if self.mcp.tools_version != self._tools_version:
+            self._tools = self.mcp.get_claude_tools()
+            self._tools_version = self.mcp.tools_version
         
         # Tracking
         iterations = 0
@@ -73,43 +140,81 @@ class AgentLoop:
         final_response = None
         
         if verbose:
-            print(f"\n{'='*60}")
-            print(f"USER: {user_message}")
-            print(f"{'='*60}\n")
+            self._log_buf.extend([f"\n{'='*60}", f"USER: {user_message}", f"{'='*60}\n"])
         
         # Agentic loop
         while iterations < self.max_iterations:
             iterations += 1
             
             if verbose:
-                print(f"[Iteration {iterations}]")
+                self._log_buf.append(f"[Iteration {iterations}]")
+            
+            # Stream Claude's reply. Read-only tool calls at the front of the
+            # reply start as soon as their input is complete, so tool I/O
+            # overlaps with decoding the rest of the message.
+            started = {}
+            early_calls = {}  # _call_key -> call, shared by identical read-only requests
+            streamed_text = False
+            mutating_seen = False
+            
+            def on_text(text):
+                nonlocal streamed_text
+                if not streamed_text:
+                    # Buffered lines have to land before the live text
+                    self._flush_log()
+                    sys.stdout.write("CLAUDE: ")
+                    streamed_text = True
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            
+            def on_tool_use(tool_use):
+                nonlocal mutating_seen
+                if mutating_seen or not self.mcp.is_parallel_safe(tool_use["name"]):
+                    # Everything from the first mutating call on waits for _execute_tools
+                    mutating_seen = True
+                    return
+                key = _call_key(tool_use["name"], tool_use["input"])
+                if key not in early_calls:
+                    early_calls[key] = asyncio.ensure_future(
+                        self._call_tool(tool_use["name"], tool_use["input"])
+                    )
+                started[tool_use["id"]] = early_calls[key]
             
-            # Call Claude
-            response = self.claude.create_message(
-                messages=messages,
-                tools=tools,
-                system=self.system_prompt
-            )
+            try:
+                response = await self.claude.stream_message(
+                    messages=self._with_cache_breakpoint(messages),
+                    tools=self._tools,
+                    system=self._system_blocks,
+                    on_text=on_text if verbose else None,
+                    on_tool_use=on_tool_use
+                )
+            except BaseException:
+                for call in started.values():
+                    call.cancel()
+                self._flush_log()
+                raise
+            
+            if streamed_text:
+                self._log_buf.append("\n")
+            if response.stop_reason != "tool_use":
+                # Claude didn't end on tool use, so nobody will collect these
+                for call in started.values():
+                    call.cancel()
+            
+            text, tool_uses = self.claude.split_content(response)
             
             # Check stop reason
             if response.stop_reason == "end_turn":
-                # Task completed
-                final_response = self.claude.extract_text(response)
+                # Task completed (text was already streamed to the console)
+                final_response = text
                 if verbose:
-                    print(f"\n{'='*60}")
-                    print(f"CLAUDE: {final_response}")
-                    print(f"{'='*60}\n")
+                    self._log_buf.append(f"{'='*60}\n")
                 break
             
             elif response.stop_reason == "tool_use":
                 # Claude wants to use tools
-                tool_uses = self.claude.extract_tool_uses(response)
-                
                 if verbose:
-                    thinking = self.claude.extract_text(response)
-                    if thinking:
-                        print(f"Claude's thinking: {thinking}\n")
-                    print(f"Claude is using {len(tool_uses)} tool(s):")
+                    self._log_buf.append(f"Claude is using {len(tool_uses)} tool(s):")
                 
                 # Add Claude's response to conversation
                 messages.append({
@@ -118,7 +223,7 @@ class AgentLoop:
                 })
                 
                 # Execute all tools
-                tool_results = await self._execute_tools(tool_uses, verbose)
+                tool_results = await self._execute_tools(tool_uses, verbose, started)
                 tools_used.extend([tu["name"] for tu in tool_uses])
                 
                 # Add tool results to conversation
@@ -126,16 +231,27 @@ class AgentLoop:
                     "role": "user",
                     "content": tool_results
                 })
+                self._prune_images(messages)
+                
+                if self.terminate_when is not None and self.terminate_when(tool_results):
+                    # The caller says these results finish the task; skip the extra round trip
+                    final_response = text
+                    if verbose:
+                        self._log_buf.append(f"{'='*60}\n")
+                    break
+                self._flush_log()
             
             elif response.stop_reason == "max_tokens":
                 logger.warning("Hit max tokens limit")
-                final_response = self.claude.extract_text(response) + "\n\n[Response truncated - max tokens reached]"
+                final_response = text + "\n\n[Response truncated - max tokens reached]"
                 break
             
             else:
                 logger.error(f"Unexpected stop reason: {response.stop_reason}")
                 break
         
+        self._flush_log()
+        
         if iterations >= self.max_iterations:
             logger.warning("Hit maximum iterations")
             final_response = final_response or "Maximum iterations reached. Task may be incomplete."
@@ -150,7 +266,8 @@ class AgentLoop:
     async def _execute_tools(
         self,
         tool_uses: List[Dict[str, Any]],
-        verbose: bool = True
+        verbose: bool = True,
+        started: Optional[Dict[str, "asyncio.Future"]] = None
     ) -> List[Dict[str, Any]]:
         """
         Execute a list of tool calls via MCP.
@@ -158,59 +275,199 @@ class AgentLoop:
         Args:
             tool_uses: List of tool use dictionaries
             verbose: Print execution details
+            started: Calls already dispatched while streaming, by tool use id
             
         Returns:
             List of tool result dictionaries for Claude
         """
-        tool_results = []
+        pending = started or {}
         
-        for tool_use in tool_uses:
-            tool_name = tool_use["name"]
-            tool_input = tool_use["input"]
-            tool_id = tool_use["id"]
+        async def _run_one(tool_use, memo=None):
+            """
+            Run one tool call, returning its tool_result and the lines to print.
+            
+            Read-only calls pass a memo so identical ones in the same batch run once.
+            """
+            tool_name, tool_input, tool_id = tool_use["name"], tool_use["input"], tool_use["id"]
+            lines = []
             
             if verbose:
-                print(f"  → {tool_name}")
-                print(f"    Input: {tool_input}")
+                lines.append(f"  → {tool_name}")
+                lines.append(f"    Input: {tool_input}")
             
             try:
-                # Execute via MCP
-                result = await self.mcp.call_tool(tool_name, tool_input)
+                # Execute via MCP, unless it was already started mid-stream
+                call = pending.get(tool_id)
+                if call is None and memo is not None:
+                    key = _call_key(tool_name, tool_input)
+                    call = memo.get(key)
+                    if call is None:
+                        call = memo[key] = asyncio.ensure_future(self._call_tool(tool_name, tool_input))
+                if call is not None:
+                    result = await call
+                else:
+                    result = await self._call_tool(tool_name, tool_input)
                 
                 # Extract result content
-                if hasattr(result, 'content') and result.content:
-                    result_text = result.content[0].text
-                else:
-                    result_text = str(result)
+                content, result_text = await self._result_content(result)
                 
                 if verbose:
-                    print(f"    Result: {result_text[:100]}...")
+                    lines.append(f"    Result: {result_text[:100]}...")
                 
                 # Format for Claude
-                tool_results.append({
+                return {
                     "type": "tool_result",
                     "tool_use_id": tool_id,
-                    "content": result_text
-                })
+                    "content": content
+                }, lines
             
             except Exception as e:
                 logger.error(f"Tool execution failed: {tool_name} - {e}")
                 
+                if verbose:
+                    lines.append(f"    ERROR: {e}")
+                
                 # Return error to Claude
-                tool_results.append({
+                return {
                     "type": "tool_result",
                     "tool_use_id": tool_id,
                     "content": f"Error executing {tool_name}: {str(e)}",
                     "is_error": True
-                })
-                
-                if verbose:
-                    print(f"    ERROR: {e}")
+                }, lines
+        
+        # Consecutive read-only calls overlap; a mutating call (click, type, ...)
+        # waits for everything before it and runs alone, keeping Claude's order.
+        # Duplicates are only merged within a batch, since a mutation in
+        # between can change what a read returns.
+        outcomes = []
+        batch = []
+        is_parallel_safe = self.mcp.is_parallel_safe
+        for tool_use in tool_uses:
+            if is_parallel_safe(tool_use["name"]):
+                batch.append(tool_use)
+                continue
+            if batch:
+                memo = {}
+                outcomes.extend(await asyncio.gather(*(_run_one(tu, memo) for tu in batch)))
+                batch = []
+            outcomes.append(await _run_one(tool_use))
+        if batch:
+            memo = {}
+            outcomes.extend(await asyncio.gather(*(_run_one(tu, memo) for tu in batch)))
+        
+        tool_results = []
+        add_result = tool_results.append
+        add_lines = self._log_buf.extend
+        for tool_result, lines in outcomes:
+            add_lines(lines)
+            add_result(tool_result)
         
         if verbose:
-            print()
+            self._log_buf.append("")
         
         return tool_results
+    
+    async def _call_tool(self, tool_name: str, tool_input: Dict[str, Any]) -> Any:
+        """Call an MCP tool within the max_parallel_tools limit."""
+        async with self._tool_sem:
+            return await self.mcp.call_tool(tool_name, tool_input)
+    
+    async def _result_content(self, result) -> Tuple[Any, str]:
+        """
+        Convert an MCP tool result into tool_result content for Claude.
+        
+        Returns:
+            (content, preview text); content is a plain string unless the
+            result carries images, which are shrunk before being attached
+        """
+        items = getattr(result, "content", None)
+        if not items:
+            text = str(result)
+            return text, text
+        if not any(getattr(item, "type", None) == "image" for item in items):
+            return items[0].text, items[0].text
+        
+        global _image_pool
+        loop = asyncio.get_running_loop()
+        blocks = []
+        texts = []
+        for item in items:
+            if item.type == "image":
+                data, media_type = item.data, item.mimeType
+                if PIL_AVAILABLE:
+                    if _image_pool is None:
+                        _image_pool = ProcessPoolExecutor()
+                    data, media_type = await loop.run_in_executor(
+                        _image_pool, _shrink_screenshot, data, media_type
+                    )
+                blocks.append({
+                    "type": "image",
+                    "source": {"type": "base64", "media_type": media_type, "data": data}
+                })
+            elif getattr(item, "text", None):
+                blocks.append({"type": "text", "text": item.text})
+                texts.append(item.text)
+        
+        return blocks, " ".join(texts) or f"[{len(blocks)} content block(s)]"
+    
+    @staticmethod
+    def _with_cache_breakpoint(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Copy of the history for one request, with a cache breakpoint on the
+        newest tool_result so the next request only pays for what was added.
+        
+        The stored history is never modified, so breakpoints can't pile up
+        across runs (the API allows four, and tools and system use two).
+        """
+        for i in range(len(messages) - 1, -1, -1):
+            message = messages[i]
+            content = message["content"]
+            if message["role"] != "user" or not isinstance(content, list) or not content:
+                continue
+            last_block = content[-1]
+            if not isinstance(last_block, dict) or last_block.get("type") != "tool_result":
+                continue
+            messages = list(messages)
+            messages[i] = {**message, "content": content[:-1] + [{**last_block, "cache_control": {"type": "ephemeral"}}]}
+            break
+        return messages
+    
+    def _prune_images(self, messages: List[Dict[str, Any]]):
+        """
+        Replace all but the newest screenshots in tool results with a text stub.
+        
+        Stubbing an image rewrites an earlier message, which invalidates the
+        prompt cache from there on. So screenshots are only pruned once
+        image_prune_slack extra ones have piled up, and then all at once: the
+        cached prefix survives the screenshots in between, at the cost of
+        sending up to max_history_images + image_prune_slack images.
+        """
+        images = []
+        for message in reversed(messages):
+            if message["role"] != "user" or not isinstance(message["content"], list):
+                continue
+            for block in message["content"]:
+                if not isinstance(block, dict) or block.get("type") != "tool_result":
+                    continue
+                content = block.get("content")
+                if not isinstance(content, list):
+                    continue
+                for i in range(len(content) - 1, -1, -1):
+                    if content[i].get("type") == "image":
+                        images.append((content, i))
+        
+        if len(images) <= self.max_history_images + self.image_prune_slack:
+            return
+        for content, i in images[self.max_history_images:]:
+            content[i] = {"type": "text", "text": "[older screenshot removed]"}
+    
+    def _flush_log(self):
+        """Write buffered verbose lines to stdout in a single call."""
+        if not self._log_buf:
+            return
+        sys.stdout.write("\n".join(self._log_buf) + "\n")
+        sys.stdout.flush()
+        self._log_buf.clear()
 
 
 # Example usage
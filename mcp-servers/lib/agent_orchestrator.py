@@ -3,7 +3,9 @@ Agent Orchestrator - Advanced task decomposition, parallel execution, and retry
 """
 import asyncio
 import logging
+import re
 import time
+from collections import Counter
 from typing import Dict, List, Any, Optional, Callable
 from dataclasses import dataclass, field
 from enum import Enum
@@ -11,6 +13,22 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# decompose_task vocabulary, matched on whole words in a single pass per clause
+_AND_RE = re.compile(r"\band\b")
+_KEYWORD_RE = re.compile(r"\b(chrome|browser|notepad|calculator|type|screenshot|snapshot|open)\b")
+
+
+def _preview(value: Any, limit: int = 200) -> Optional[str]:
+    """Short text form of a value, without rendering all of a large string or sequence."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value[:limit]
+    if isinstance(value, (bytes, bytearray, list, tuple)):
+        # Each element renders as at least one character, so `limit` elements suffice
+        value = value[:limit]
+    return str(value)[:limit]
+
 
 class TaskStatus(Enum):
     """Task execution status."""
@@ -22,7 +40,7 @@ class TaskStatus(Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     """Represents a single task in a workflow."""
     task_id: str
@@ -34,13 +52,13 @@ class Task:
     error: Optional[str] = None
     retry_count: int = 0
     max_retries: int = 3
-    created_at: float = field(default_factory=time.time)
+    created_at: float = field(default_factory=time.monotonic)
     started_at: Optional[float] = None
     completed_at: Optional[float] = None
     
     def duration(self) -> Optional[float]:
         """Get task execution duration in seconds."""
-        if self.started_at and self.completed_at:
+        if self.started_at is not None and self.completed_at is not None:
             return self.completed_at - self.started_at
         return None
     
@@ -56,72 +74,91 @@ class Task:
             "arguments": self.arguments,
             "dependencies": self.dependencies,
             "status": self.status.value,
-            "result": str(self.result)[:200] if self.result else None,
+            "result": _preview(self.result),
             "error": self.error,
             "retry_count": self.retry_count,
             "duration": self.duration()
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Workflow:
     """Represents a workflow of multiple tasks."""
     workflow_id: str
     tasks: List[Task] = field(default_factory=list)
-    created_at: float = field(default_factory=time.time)
+    created_at: float = field(default_factory=time.monotonic)
     completed_at: Optional[float] = None
+    _tasks_by_id: Dict[str, Task] = field(default_factory=dict, init=False, repr=False)
+    # Unmet dependency count per task, and the reverse edges that decrement it
+    in_degree: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    dependents: Dict[str, List[str]] = field(default_factory=dict, init=False, repr=False)
+    # Tasks per status; keep in sync by changing status through set_status()
+    _status_counts: Dict[TaskStatus, int] = field(default_factory=Counter, init=False, repr=False)
+    
+    def __post_init__(self):
+        for task in self.tasks:
+            self._index(task)
+    
+    def _index(self, task: Task):
+        """Register a task's ID and dependency edges (first ID wins, as a scan would)."""
+        self._tasks_by_id.setdefault(task.task_id, task)
+        self._status_counts[task.status] += 1
+        self.dependents.setdefault(task.task_id, [])
+        unmet = 0
+        for dep_id in task.dependencies:
+            dep = self._tasks_by_id.get(dep_id)
+            if dep is None or dep.status != TaskStatus.COMPLETED:
+                unmet += 1
+            self.dependents.setdefault(dep_id, []).append(task.task_id)
+        self.in_degree[task.task_id] = unmet
     
     def add_task(self, task: Task):
         """Add a task to the workflow."""
         self.tasks.append(task)
+        self._index(task)
     
     def get_task(self, task_id: str) -> Optional[Task]:
         """Get a task by ID."""
-        for task in self.tasks:
-            if task.task_id == task_id:
-                return task
-        return None
+        return self._tasks_by_id.get(task_id)
     
-    def get_pending_tasks(self) -> List[Task]:
-        """Get all pending tasks whose dependencies are met."""
-        pending = []
-        for task in self.tasks:
-            if task.status != TaskStatus.PENDING:
-                continue
-            
-            # Check if all dependencies are completed
-            dependencies_met = all(
-                self.get_task(dep_id).status == TaskStatus.COMPLETED
-                for dep_id in task.dependencies
-            )
-            
-            if dependencies_met:
-                pending.append(task)
-        
-        return pending
+    def set_status(self, task: Task, status: TaskStatus):
+        """Change a task's status, keeping the per-status counts current."""
+        self._status_counts[task.status] -= 1
+        self._status_counts[status] += 1
+        task.status = status
+    
+    def ready_tasks(self) -> List[Task]:
+        """Get all pending tasks with no unmet dependencies."""
+        return [
+            task for task in self.tasks
+            if task.status == TaskStatus.PENDING and self.in_degree[task.task_id] == 0
+        ]
     
-    def get_failed_tasks(self) -> List[Task]:
-        """Get all failed tasks that can be retried."""
-        return [task for task in self.tasks if task.can_retry()]
+    def mark_completed(self, task: Task) -> List[Task]:
+        """Release a completed task's dependents; returns those that became ready."""
+        newly_ready = []
+        for dependent_id in self.dependents.get(task.task_id, ()):
+            self.in_degree[dependent_id] -= 1
+            if self.in_degree[dependent_id] == 0:
+                newly_ready.append(self._tasks_by_id[dependent_id])
+        return newly_ready
     
     def is_complete(self) -> bool:
         """Check if workflow is complete."""
-        return all(
-            task.status in [TaskStatus.COMPLETED, TaskStatus.CANCELLED]
-            for task in self.tasks
-        )
+        counts = self._status_counts
+        return counts[TaskStatus.COMPLETED] + counts[TaskStatus.CANCELLED] == len(self.tasks)
     
     def has_failures(self) -> bool:
         """Check if workflow has any failures."""
-        return any(task.status == TaskStatus.FAILED for task in self.tasks)
+        return self._status_counts[TaskStatus.FAILED] > 0
     
     def summary(self) -> Dict[str, Any]:
         """Get workflow summary."""
-        status_counts = {}
-        for status in TaskStatus:
-            count = sum(1 for task in self.tasks if task.status == status)
-            if count > 0:
-                status_counts[status.value] = count
+        status_counts = {
+            status.value: self._status_counts[status]
+            for status in TaskStatus
+            if self._status_counts[status] > 0
+        }
         
         return {
             "workflow_id": self.workflow_id,
@@ -129,7 +166,7 @@ class Workflow:
             "status_counts": status_counts,
             "is_complete": self.is_complete(),
             "has_failures": self.has_failures(),
-            "duration": (self.completed_at or time.time()) - self.created_at
+            "duration": (self.completed_at or time.monotonic()) - self.created_at
         }
 
 
@@ -158,6 +195,9 @@ class AgentOrchestrator:
         self.retry_backoff = retry_backoff
         
         self.workflows: Dict[str, Workflow] = {}
+        # Shared by every workflow, so concurrent workflows stay within one
+        # max_parallel budget against the tool backend
+        self._parallel_sem = asyncio.Semaphore(max_parallel)
         self.task_queue = asyncio.Queue()
         
         logger.info(f"AgentOrchestrator initialized (max_parallel={max_parallel})")
@@ -193,75 +233,95 @@ class AgentOrchestrator:
             logger.error(f"Workflow {workflow_id} timed out")
             # Cancel remaining tasks
             for task in workflow.tasks:
-                if task.status == TaskStatus.PENDING or task.status == TaskStatus.RUNNING:
-                    task.status = TaskStatus.CANCELLED
+                if task.status in (TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.RETRYING):
+                    workflow.set_status(task, TaskStatus.CANCELLED)
         
-        workflow.completed_at = time.time()
+        workflow.completed_at = time.monotonic()
         logger.info(f"Workflow {workflow_id} completed: {workflow.summary()}")
         
         return workflow
     
     async def _execute_workflow_internal(self, workflow: Workflow):
-        """Internal workflow execution logic."""
-        # Create semaphore for parallel execution limit
-        semaphore = asyncio.Semaphore(self.max_parallel)
+        """
+        Internal workflow execution logic.
         
-        while not workflow.is_complete():
-            # Get pending tasks
-            pending_tasks = workflow.get_pending_tasks()
-            
-            if not pending_tasks:
-                # Check for failed tasks that can be retried
-                failed_tasks = workflow.get_failed_tasks()
+        Event-driven: each finished task releases its dependents (via the
+        workflow's precomputed in-degrees) straight onto a ready queue that
+        max_parallel workers drain, so nothing polls or rescans.
+        """
+        ready: asyncio.Queue = asyncio.Queue()
+        outstanding = 0  # Tasks queued, running or waiting to retry
+        loop = asyncio.get_running_loop()
+        retry_timers = []
+        done = asyncio.Event()
+        
+        def enqueue(task: Task):
+            nonlocal outstanding
+            outstanding += 1
+            ready.put_nowait(task)
+        
+        for task in workflow.ready_tasks():
+            enqueue(task)
+        
+        if not outstanding:
+            return
+        
+        async def worker():
+            nonlocal outstanding
+            while True:
+                task = await ready.get()
+                await self._execute_task(task, workflow)
                 
-                if failed_tasks:
-                    logger.info(f"Retrying {len(failed_tasks)} failed tasks")
-                    for task in failed_tasks:
-                        task.status = TaskStatus.RETRYING
-                        task.retry_count += 1
-                    pending_tasks = failed_tasks
-                else:
-                    # No pending or retryable tasks, workflow is stuck or complete
-                    break
-            
-            # Execute pending tasks in parallel
-            if pending_tasks:
-                await asyncio.gather(
-                    *[self._execute_task(task, semaphore) for task in pending_tasks],
-                    return_exceptions=True
-                )
-            else:
-                # Wait a bit before checking again
-                await asyncio.sleep(0.1)
+                if task.status == TaskStatus.COMPLETED:
+                    for dependent in workflow.mark_completed(task):
+                        enqueue(dependent)
+                elif task.can_retry():
+                    workflow.set_status(task, TaskStatus.RETRYING)
+                    task.retry_count += 1
+                    delay = self.retry_delay * (self.retry_backoff ** (task.retry_count - 1))
+                    logger.info(f"Task {task.task_id} retry {task.retry_count} in {delay:.1f}s")
+                    # Back off on a loop timer rather than inside a worker, so
+                    # every parallel slot keeps running real work meanwhile
+                    outstanding += 1
+                    retry_timers.append(loop.call_later(delay, ready.put_nowait, task))
+                
+                # Nothing queued or running means nothing else can become ready
+                outstanding -= 1
+                if not outstanding:
+                    done.set()
+        
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.max_parallel, len(workflow.tasks)))]
+        try:
+            await done.wait()
+        finally:
+            for timer in retry_timers:
+                timer.cancel()
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
     
-    async def _execute_task(self, task: Task, semaphore: asyncio.Semaphore):
+    async def _execute_task(self, task: Task, workflow: Workflow):
         """Execute a single task with retry logic."""
-        async with semaphore:
-            task.status = TaskStatus.RUNNING
-            task.started_at = time.time()
+        async with self._parallel_sem:
+            workflow.set_status(task, TaskStatus.RUNNING)
+            task.started_at = time.monotonic()
             
             logger.info(f"Executing task {task.task_id}: {task.tool_name}")
             
             try:
-                # Calculate retry delay with exponential backoff
-                if task.retry_count > 0:
-                    delay = self.retry_delay * (self.retry_backoff ** (task.retry_count - 1))
-                    logger.info(f"Task {task.task_id} retry {task.retry_count}, waiting {delay:.1f}s")
-                    await asyncio.sleep(delay)
-                
                 # Execute the tool
                 result = await self.tool_executor(task.tool_name, task.arguments)
                 
                 task.result = result
-                task.status = TaskStatus.COMPLETED
-                task.completed_at = time.time()
+                workflow.set_status(task, TaskStatus.COMPLETED)
+                task.completed_at = time.monotonic()
                 
                 logger.info(f"Task {task.task_id} completed in {task.duration():.2f}s")
                 
             except Exception as e:
                 task.error = str(e)
-                task.status = TaskStatus.FAILED
-                task.completed_at = time.time()
+                workflow.set_status(task, TaskStatus.FAILED)
+                task.completed_at = time.monotonic()
                 
                 logger.error(f"Task {task.task_id} failed: {e}")
                 
@@ -286,29 +346,33 @@ class AgentOrchestrator:
         
         # Simple keyword-based decomposition
         lower_task = complex_task.lower()
+        parts = _AND_RE.split(lower_task)
+        # Keyword -> end offset of its last occurrence, for each clause
+        part_keywords = [
+            {match.group(1): match.end() for match in _KEYWORD_RE.finditer(part)}
+            for part in parts
+        ]
         
         # Pattern: "open X and do Y"
-        if "open" in lower_task and "and" in lower_task:
-            parts = lower_task.split("and")
-            
-            for i, part in enumerate(parts):
+        if len(parts) > 1 and any("open" in found for found in part_keywords):
+            for i, (part, found) in enumerate(zip(parts, part_keywords)):
                 task_id = f"task_{task_counter}"
                 task_counter += 1
                 
                 # Determine tool based on keywords
-                if "chrome" in part or "browser" in part:
+                if "chrome" in found or "browser" in found:
                     tool_name = "browser"
                     args = {"action": "launch"}
-                elif "notepad" in part or "calculator" in part:
-                    app_name = "notepad" if "notepad" in part else "calc"
+                elif "notepad" in found or "calculator" in found:
+                    app_name = "notepad" if "notepad" in found else "calc"
                     tool_name = "app"
                     args = {"action": "launch", "name": app_name}
-                elif "type" in part:
+                elif "type" in found:
                     # Extract text to type
-                    text = part.split("type")[-1].strip()
+                    text = part[found["type"]:].strip()
                     tool_name = "type"
                     args = {"text": text}
-                elif "screenshot" in part or "snapshot" in part:
+                elif "screenshot" in found or "snapshot" in found:
                     tool_name = "snapshot"
                     args = {}
                 else:
@@ -327,13 +391,14 @@ class AgentOrchestrator:
         
         # Single action
         else:
-            if "screenshot" in lower_task or "snapshot" in lower_task:
+            found = {keyword for keywords in part_keywords for keyword in keywords}
+            if "screenshot" in found or "snapshot" in found:
                 tasks.append(Task(
                     task_id="task_0",
                     tool_name="snapshot",
                     arguments={}
                 ))
-            elif "open" in lower_task:
+            elif "open" in found:
                 tasks.append(Task(
                     task_id="task_0",
                     tool_name="app",
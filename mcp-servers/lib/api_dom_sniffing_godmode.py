@@ -8,16 +8,86 @@ import logging
 import json
 import time
 import re
+import sys
 import websockets
 from typing import Dict, List, Any, Optional, Set, Tuple, Callable
 from dataclasses import dataclass, field
 from urllib.parse import urlparse, parse_qs, urljoin
 import hashlib
-from collections import defaultdict, deque
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
 import aiohttp
 
+try:
+    import orjson  # Optional: faster parsing of CDP frames and WebSocket payloads
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson  # Optional: decode only the parts of a CDP frame that are used
+except ImportError:
+    simdjson = None
+
 logger = logging.getLogger(__name__)
 
+_COOKIE_RE = re.compile(r"([^=;\s]+)=([^;]*)")
+# A WebSocket payload whose first top-level key is a plain string "type"; its
+# message kind can be read without parsing the whole message
+_PATTERN_RE = re.compile(r'\{\s*"type"\s*:\s*"([^"\\]{1,64})"')
+# Path segments that identify a record rather than an endpoint: numbers, UUIDs, long hex
+_ID_SEGMENT_RE = re.compile(
+    r"/(?:\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,})(?=/|$)",
+    re.IGNORECASE
+)
+SEMANTIC_BATCH_SIZE = 16  # Endpoints described to the LLM per call
+DOM_DELTA_CAPACITY = 500  # Recent DOM mutations kept
+SEND_QUEUE_SIZE = 1024  # Outbound CDP frames buffered before senders wait
+SEND_QUEUE_TIMEOUT = 5.0  # Seconds a sender waits for room before giving up
+SEND_BATCH_SIZE = 64  # Frames written per writer wakeup
+# Only requests that can carry API calls are paused by Fetch
+INTERCEPTED_RESOURCE_TYPES = ("XHR", "Fetch", "WebSocket", "Document")
+_STATIC_EXTS = frozenset({
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".css", ".woff", ".woff2", ".ico", ".mp4", ".webp"
+})
+_MUTATION_TYPES = ("added", "removed", "modified", "attribute")
+_MUTATION_TYPE_IDS = {name: i for i, name in enumerate(_MUTATION_TYPES)}
+
+
+def _json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def _json_dumps(obj) -> str:
+    # Kept as text: CDP expects text frames
+    return orjson.dumps(obj).decode() if orjson else json.dumps(obj)
+
+def _maybe_json(payload: str) -> bool:
+    """Cheap check that a WebSocket payload could be a JSON object or array."""
+    return payload[:1] in ("{", "[")
+
+@lru_cache(maxsize=4096)
+def _netloc(url: str) -> str:
+    """Domain of a URL; the same few hosts are seen on nearly every request."""
+    return urlparse(url).netloc
+
+def _url_template(url: str) -> str:
+    """URL without query string and with ID-like path segments replaced by {id}."""
+    return _ID_SEGMENT_RE.sub("/{id}", url.split("?", 1)[0])
+
+def _is_static_asset(url: str) -> bool:
+    """Whether a URL's file extension marks it as an image, font, stylesheet or video."""
+    name = url.split("?", 1)[0].rsplit("/", 1)[-1]
+    dot = name.rfind(".")
+    return dot != -1 and name[dot:].lower() in _STATIC_EXTS
+
+def _materialize(value):
+    """Turn a lazy simdjson value into plain dicts/lists."""
+    if isinstance(value, simdjson.Object):
+        return value.as_dict()
+    if isinstance(value, simdjson.Array):
+        return value.as_list()
+    return value
+
 
 @dataclass
 class SemanticAPIEndpoint:
@@ -60,7 +130,7 @@ class WebSocketChannel:
     protocol: Optional[str] = None
     messages_sent: int = 0
     messages_received: int = 0
-    message_patterns: Dict[str, int] = field(default_factory=dict)  # Pattern -> count
+    message_patterns: Dict[str, int] = field(default_factory=Counter)  # Pattern -> count
     last_message: Optional[Dict[str, Any]] = None
     semantic_type: Optional[str] = None  # e.g., "real_time_updates", "chat", "notifications"
     
@@ -70,7 +140,7 @@ class WebSocketChannel:
             "semantic_type": self.semantic_type,
             "messages_sent": self.messages_sent,
             "messages_received": self.messages_received,
-            "top_patterns": sorted(self.message_patterns.items(), key=lambda x: x[1], reverse=True)[:5]
+            "top_patterns": self.message_patterns.most_common(5)
         }
 
 
@@ -108,6 +178,11 @@ class HeadlessScript:
 class CDPClient:
     """Chrome DevTools Protocol Client - The Ghost Interceptor"""
     
+    # Pre-serialized frames for fixed-shape commands sent on every request
+    _CMD_TEMPLATES = {
+        "Fetch.continueRequest": '{{"id":{id},"method":"Fetch.continueRequest","params":{{"requestId":{rid}}}}}',
+    }
+    
     def __init__(self, websocket_url: str = "ws://localhost:9222"):
         self.websocket_url = websocket_url
         self.ws: Optional[websockets.WebSocketClientProtocol] = None
@@ -115,6 +190,8 @@ class CDPClient:
         self.pending_requests: Dict[int, asyncio.Future] = {}
         self.event_handlers: Dict[str, List[Callable]] = defaultdict(list)
         self.connected = False
+        self._parser = simdjson.Parser() if simdjson else None
+        self._send_queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
     
     async def connect(self):
         """Connect to Chrome via CDP"""
@@ -128,8 +205,9 @@ class CDPClient:
                         self.ws = await websockets.connect(ws_url)
                         self.connected = True
                         
-                        # Start message handler
+                        # Start message handler and writer
                         asyncio.create_task(self._handle_messages())
+                        asyncio.create_task(self._write_messages())
                         
                         logger.info("✅ CDP connected (GHOST MODE)")
                         return True
@@ -144,24 +222,95 @@ class CDPClient:
         """Handle incoming CDP messages"""
         try:
             async for message in self.ws:
-                data = json.loads(message)
+                msg_id, method, payload = self._parse_frame(message)
                 
                 # Handle responses
-                if "id" in data and data["id"] in self.pending_requests:
-                    future = self.pending_requests.pop(data["id"])
-                    future.set_result(data.get("result"))
+                if msg_id is not None and msg_id in self.pending_requests:
+                    future = self.pending_requests.pop(msg_id)
+                    future.set_result(payload)
                 
                 # Handle events
-                elif "method" in data:
-                    method = data["method"]
-                    params = data.get("params", {})
-                    
-                    # Call registered handlers
-                    for handler in self.event_handlers.get(method, []):
-                        asyncio.create_task(handler(params))
+                elif method is not None:
+                    # Run registered handlers inline, in arrival order
+                    handlers = self.event_handlers.get(method)
+                    if not handlers:
+                        continue
+                    try:
+                        if len(handlers) == 1:
+                            await handlers[0](payload)
+                        else:
+                            await asyncio.gather(*(handler(payload) for handler in handlers))
+                    except Exception as e:
+                        logger.error(f"CDP handler for {method} failed: {e}")
         
         except Exception as e:
             logger.error(f"CDP message handler error: {e}")
+        
+        self._connection_lost()
+    
+    async def _write_messages(self):
+        """Send queued CDP frames, writing everything that piled up per wakeup"""
+        queue = self._send_queue
+        try:
+            while True:
+                frames = [await queue.get()]
+                while len(frames) < SEND_BATCH_SIZE and not queue.empty():
+                    frames.append(queue.get_nowait())
+                for frame in frames:
+                    await self.ws.send(frame)
+        
+        except Exception as e:
+            logger.error(f"CDP writer error: {e}")
+            self._connection_lost()
+    
+    def _connection_lost(self):
+        """Mark the client disconnected and fail everything waiting on it"""
+        if not self.connected:
+            return
+        self.connected = False
+        for future in self.pending_requests.values():
+            if not future.done():
+                future.set_exception(Exception("CDP connection lost"))
+        self.pending_requests.clear()
+        # Dropping unsent frames wakes senders blocked on a full queue
+        while not self._send_queue.empty():
+            self._send_queue.get_nowait()
+    
+    async def _enqueue(self, frame: str):
+        """Queue a frame for the writer, failing instead of waiting on a dead one"""
+        if not self.connected:
+            raise Exception("CDP not connected")
+        try:
+            await asyncio.wait_for(self._send_queue.put(frame), timeout=SEND_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise Exception("CDP send queue full") from None
+        if not self.connected:
+            raise Exception("CDP connection lost")
+    
+    def _parse_frame(self, message) -> Tuple[Optional[int], Optional[str], Any]:
+        """
+        Decode a CDP frame into (id, method, result or params).
+        
+        With simdjson only id and method are read up front; the result or
+        params are converted to Python objects only when someone is waiting
+        for them. Nothing lazy escapes, since the parser is reused per frame.
+        """
+        if self._parser is None:
+            data = _json_loads(message)
+            msg_id = data.get("id")
+            if msg_id is not None and msg_id in self.pending_requests:
+                return msg_id, None, data.get("result")
+            return None, data.get("method"), data.get("params", {})
+        
+        doc = self._parser.parse(message)
+        msg_id = doc.get("id")
+        if msg_id is not None and msg_id in self.pending_requests:
+            return msg_id, None, _materialize(doc.get("result"))
+        
+        method = doc.get("method")
+        if method not in self.event_handlers:
+            return None, method, None
+        return None, method, _materialize(doc.get("params", {}))
     
     async def send_command(self, method: str, params: Optional[Dict] = None) -> Any:
         """Send CDP command"""
@@ -169,30 +318,53 @@ class CDPClient:
             raise Exception("CDP not connected")
         
         self.message_id += 1
+        msg_id = self.message_id
         message = {
-            "id": self.message_id,
+            "id": msg_id,
             "method": method,
             "params": params or {}
         }
         
         # Create future for response
         future = asyncio.Future()
-        self.pending_requests[self.message_id] = future
+        self.pending_requests[msg_id] = future
         
         # Send message
-        await self.ws.send(json.dumps(message))
+        try:
+            await self._enqueue(_json_dumps(message))
+        except Exception:
+            self.pending_requests.pop(msg_id, None)
+            # If the connection dropped, the future already carries that error
+            if not future.done():
+                raise
         
         # Wait for response
         return await asyncio.wait_for(future, timeout=30)
     
+    async def send_continue(self, request_id: str):
+        """Let a paused request proceed, without waiting for Chrome's empty reply"""
+        self.message_id += 1
+        await self._enqueue(self._CMD_TEMPLATES["Fetch.continueRequest"].format(
+            id=self.message_id,
+            rid=_json_dumps(request_id)
+        ))
+    
     def on(self, event: str, handler: Callable):
-        """Register event handler"""
+        """
+        Register event handler
+        
+        Handlers run inside the message loop, so they must not await
+        send_command (its reply could never be read); queue slow work instead.
+        """
         self.event_handlers[event].append(handler)
     
     async def enable_network_interception(self):
         """Enable network request interception"""
         await self.send_command("Fetch.enable", {
-            "patterns": [{"urlPattern": "*", "requestStage": "Request"}]
+            "patterns": [
+                {"urlPattern": "*", "resourceType": resource_type, "requestStage": "Request"}
+                for resource_type in INTERCEPTED_RESOURCE_TYPES
+            ]
         })
         logger.info("🕵️ Network interception enabled (INVISIBLE MODE)")
     
@@ -257,7 +429,14 @@ class APIAndDOMSniffingGodMode:
         # Discovered data (semantic)
         self.semantic_apis: Dict[str, SemanticAPIEndpoint] = {}
         self.websocket_channels: Dict[str, WebSocketChannel] = {}
-        self.dom_deltas: deque = deque(maxlen=500)  # Only recent mutations
+        # Only recent mutations, as a ring buffer of parallel arrays; selectors
+        # are interned so each slot stores a small integer per field
+        self._delta_ts = array("d", [0.0]) * DOM_DELTA_CAPACITY
+        self._delta_type = array("B", [0]) * DOM_DELTA_CAPACITY
+        self._delta_selector_id = array("l", [0]) * DOM_DELTA_CAPACITY
+        self._delta_head = 0
+        self._selectors: List[str] = []
+        self._selector_ids: Dict[str, int] = {}
         self.headless_scripts: Dict[str, HeadlessScript] = {}
         
         # Learning phases
@@ -276,6 +455,11 @@ class APIAndDOMSniffingGodMode:
         self.dom_mutations = 0
         self.time_saved = 0.0
         
+        # Endpoints waiting for semantic analysis (started in initialize)
+        self._semantic_queue: asyncio.Queue = asyncio.Queue()
+        self._semantic_pending: Set[str] = set()
+        self._semantic_task: Optional[asyncio.Task] = None
+        
         logger.info("🔥 API & DOM Sniffing GOD MODE initialized")
         logger.info(f"  → CDP Interception: {'ENABLED' if enable_cdp else 'DISABLED'}")
         logger.info(f"  → WebSocket Tracking: {'ENABLED' if enable_websocket else 'DISABLED'}")
@@ -285,6 +469,9 @@ class APIAndDOMSniffingGodMode:
     async def initialize(self):
         """Initialize CDP and start monitoring"""
         
+        if self.ai_semantic_analyzer and self._semantic_task is None:
+            self._semantic_task = asyncio.create_task(self._semantic_worker())
+        
         if self.enable_cdp:
             # Connect to Chrome via CDP
             self.cdp = CDPClient()
@@ -340,77 +527,109 @@ class APIAndDOMSniffingGodMode:
         
         logger.debug(f"🕵️ Intercepted: {method} {url}")
         
+        # Static files carry no auth or API semantics worth learning
+        if _is_static_asset(url):
+            await self.cdp.send_continue(request_id)
+            return
+        
         # Extract auth tokens
         await self._extract_auth_from_request(headers, url)
         
         # Continue request (or modify/block it)
-        await self.cdp.send_command("Fetch.continueRequest", {
-            "requestId": request_id
-        })
+        await self.cdp.send_continue(request_id)
         
-        # Perform semantic analysis
+        # Queue semantic analysis; it runs batched in the background
         if self.ai_semantic_analyzer:
-            await self._semantic_analysis_of_api(url, method, headers, request.get("postData"))
+            self._queue_semantic_analysis(url, method, headers, request.get("postData"))
     
-    async def _semantic_analysis_of_api(
+    def _queue_semantic_analysis(
         self,
         url: str,
         method: str,
         headers: Dict[str, str],
         body: Optional[str]
     ):
-        """Use LLM to understand API intent"""
-        
-        endpoint_key = f"{method}:{url}"
+        """Queue an endpoint for LLM analysis unless its URL template is already known"""
+        endpoint_key = f"{method}:{_url_template(url)}"
+        if endpoint_key in self.semantic_apis or endpoint_key in self._semantic_pending:
+            return
+        self._semantic_pending.add(endpoint_key)
+        self._semantic_queue.put_nowait((endpoint_key, url, method, headers, body))
+    
+    async def _semantic_worker(self):
+        """Drain queued endpoints and analyze them in batches"""
+        queue = self._semantic_queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < SEMANTIC_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            try:
+                await self._semantic_analysis_of_apis(batch)
+            except Exception as e:
+                logger.error(f"Semantic analysis failed: {e}")
+            finally:
+                self._semantic_pending.difference_update(key for key, *_ in batch)
+    
+    async def _semantic_analysis_of_apis(
+        self,
+        batch: List[Tuple[str, str, str, Dict[str, str], Optional[str]]]
+    ):
+        """Use one LLM call to understand the intent of several APIs"""
         
-        if endpoint_key not in self.semantic_apis:
-            # Ask LLM to analyze
-            prompt = f"""Analyze this API endpoint:
-URL: {url}
+        # Ask LLM to analyze
+        descriptions = "\n\n".join(
+            f"""{i}. URL: {url}
 Method: {method}
-Headers: {json.dumps(headers, indent=2)}
-Body: {body[:200] if body else 'None'}
+Headers: {json.dumps(headers)}
+Body: {body[:200] if body else 'None'}"""
+            for i, (_, url, method, headers, body) in enumerate(batch, 1)
+        )
+        prompt = f"""Analyze these {len(batch)} API endpoints:
 
-Provide:
+{descriptions}
+
+For each endpoint provide:
 1. Semantic label (what this API does in plain English)
 2. Intent category (authentication, data_fetch, data_update, user_management, etc.)
 3. Success indicators (what response means success)
 4. Whether this can run headless (without browser)
 
-Return JSON:
-{{
-    "semantic_label": "...",
-    "intent": "...",
-    "success_indicators": [...],
-    "can_run_headless": true/false
-}}
+Return a JSON array with one object per endpoint, in the same order:
+[
+    {{
+        "semantic_label": "...",
+        "intent": "...",
+        "success_indicators": [...],
+        "can_run_headless": true/false
+    }}
+]
 """
+        
+        analysis = await self.ai_semantic_analyzer(prompt)
+        analyses = _json_loads(analysis)
+        if isinstance(analyses, dict):
+            analyses = [analyses]
+        
+        for (endpoint_key, url, method, headers, _), analysis_json in zip(batch, analyses):
+            # Create semantic endpoint
+            endpoint = SemanticAPIEndpoint(
+                url=url,
+                method=method,
+                semantic_label=analysis_json.get("semantic_label", "Unknown"),
+                intent=analysis_json.get("intent", "unknown"),
+                headers=headers,
+                success_indicators=analysis_json.get("success_indicators", []),
+                can_run_headless=analysis_json.get("can_run_headless", False)
+            )
             
-            try:
-                analysis = await self.ai_semantic_analyzer(prompt)
-                analysis_json = json.loads(analysis)
-                
-                # Create semantic endpoint
-                endpoint = SemanticAPIEndpoint(
-                    url=url,
-                    method=method,
-                    semantic_label=analysis_json.get("semantic_label", "Unknown"),
-                    intent=analysis_json.get("intent", "unknown"),
-                    headers=headers,
-                    success_indicators=analysis_json.get("success_indicators", []),
-                    can_run_headless=analysis_json.get("can_run_headless", False)
-                )
-                
-                self.semantic_apis[endpoint_key] = endpoint
-                
-                logger.info(f"🧠 Semantic API: {endpoint.semantic_label}")
-                
-                # Auto-generate headless script if possible
-                if self.auto_headless and endpoint.can_run_headless:
-                    await self._generate_headless_script(endpoint)
-                
-            except Exception as e:
-                logger.error(f"Semantic analysis failed: {e}")
+            self.semantic_apis[endpoint_key] = endpoint
+            
+            logger.info(f"🧠 Semantic API: {endpoint.semantic_label}")
+            
+            # Auto-generate headless script if possible
+            if self.auto_headless and endpoint.can_run_headless:
+                await self._generate_headless_script(endpoint)
     
     async def _generate_headless_script(self, endpoint: SemanticAPIEndpoint):
         """Generate Python code for headless execution"""
@@ -508,22 +727,31 @@ def {script_name}(auth_token: str, **kwargs):
     
     def _analyze_websocket_pattern(self, channel: WebSocketChannel, payload: str):
         """Analyze WebSocket message patterns"""
+        # Extract pattern (e.g., message type). Most payloads open with a
+        # string "type", which wins over event/action anyway, so that case skips
+        # the parse; the same few names repeat, so intern them for the counter
+        match = _PATTERN_RE.match(payload)
+        if match:
+            channel.message_patterns[sys.intern(match.group(1))] += 1
+            return
+        if not _maybe_json(payload):
+            return
         try:
-            data = json.loads(payload)
-            
-            # Extract pattern (e.g., message type)
+            data = _json_loads(payload)
             if isinstance(data, dict):
                 msg_type = data.get("type") or data.get("event") or data.get("action")
                 if msg_type:
-                    channel.message_patterns[msg_type] = channel.message_patterns.get(msg_type, 0) + 1
+                    channel.message_patterns[msg_type] += 1
         except:
             pass
     
     async def _check_websocket_triggers(self, channel: WebSocketChannel, payload: str):
         """Check if WebSocket message should trigger automated action"""
         # Example: If we receive a "new_message" event, auto-respond
+        if not _maybe_json(payload):
+            return
         try:
-            data = json.loads(payload)
+            data = _json_loads(payload)
             
             # This is where you'd implement logic like:
             # - If price drops, execute trade
@@ -541,20 +769,25 @@ def {script_name}(auth_token: str, **kwargs):
         # In real implementation, you'd get specific mutation details
         # For now, we log that DOM changed
         
-        delta = DOMDelta(
-            timestamp=time.time(),
-            mutation_type="modified",
-            selector="unknown",
-            change_data=params
-        )
-        
-        self.dom_deltas.append(delta)
+        slot = self._delta_head
+        self._delta_ts[slot] = time.time()
+        self._delta_type[slot] = _MUTATION_TYPE_IDS["modified"]
+        self._delta_selector_id[slot] = self._selector_id("unknown")
+        self._delta_head = (slot + 1) % DOM_DELTA_CAPACITY
         
         # Check if this mutation should trigger an action
-        await self._check_dom_triggers(delta)
-    
-    async def _check_dom_triggers(self, delta: DOMDelta):
-        """Check if DOM change should trigger automated action"""
+        await self._check_dom_triggers(slot)
+    
+    def _selector_id(self, selector: str) -> int:
+        """Intern a selector string for the DOM delta ring buffer"""
+        selector_id = self._selector_ids.get(selector)
+        if selector_id is None:
+            selector_id = self._selector_ids[selector] = len(self._selectors)
+            self._selectors.append(selector)
+        return selector_id
+    
+    async def _check_dom_triggers(self, slot: int):
+        """Check if DOM change (a slot in the delta ring buffer) should trigger automated action"""
         # Example: If "Success" toast appears, continue to next step
         # Example: If "Error" modal appears, retry or alert
         
@@ -563,24 +796,24 @@ def {script_name}(auth_token: str, **kwargs):
     
     async def _extract_auth_from_request(self, headers: Dict[str, str], url: str):
         """Extract authentication tokens from request"""
-        domain = urlparse(url).netloc
+        domain = _netloc(url)
+        # Header names are case-insensitive and CDP keeps the page's casing
+        headers = {name.lower(): value for name, value in headers.items()}
         
         # Extract various auth types
-        if "authorization" in headers:
-            auth = headers["authorization"]
-            if auth.startswith("Bearer "):
-                token = auth.replace("Bearer ", "")
-                self.auth_tokens[domain] = token
-                logger.info(f"🔑 Extracted Bearer token for {domain}")
-        
-        if "cookie" in headers:
-            cookies = headers["cookie"]
+        auth = headers.get("authorization", "")
+        if auth.startswith("Bearer "):
+            token = auth.replace("Bearer ", "")
+            self.auth_tokens[domain] = token
+            logger.info(f"🔑 Extracted Bearer token for {domain}")
+        
+        cookies = headers.get("cookie")
+        if cookies:
             # Parse cookies
-            cookie_list = []
-            for cookie in cookies.split(";"):
-                if "=" in cookie:
-                    name, value = cookie.strip().split("=", 1)
-                    cookie_list.append({"name": name, "value": value})
+            cookie_list = [
+                {"name": match.group(1), "value": match.group(2)}
+                for match in _COOKIE_RE.finditer(cookies)
+            ]
             
             if cookie_list:
                 self.cookies[domain] = cookie_list
@@ -667,6 +900,20 @@ def {script_name}(auth_token: str, **kwargs):
         """Get all semantically labeled APIs"""
         return [api.to_dict() for api in self.semantic_apis.values()]
     
+    def get_dom_deltas(self) -> List[Dict[str, Any]]:
+        """Get recent DOM mutations, oldest first"""
+        count = min(self.dom_mutations, DOM_DELTA_CAPACITY)
+        start = self._delta_head - count
+        return [
+            DOMDelta(
+                timestamp=self._delta_ts[slot],
+                mutation_type=_MUTATION_TYPES[self._delta_type[slot]],
+                selector=self._selectors[self._delta_selector_id[slot]],
+                change_data={}
+            ).to_dict()
+            for slot in (i % DOM_DELTA_CAPACITY for i in range(start, self._delta_head))
+        ]
+    
     def get_websocket_channels(self) -> List[Dict[str, Any]]:
         """Get all WebSocket channels"""
         return [ws.to_dict() for ws in self.websocket_channels.values()]
@@ -2,7 +2,7 @@
 Claude Client - Wrapper for Anthropic API with tool support
 """
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable
 import anthropic
 
 logger = logging.getLogger(__name__)
@@ -13,6 +13,7 @@ class ClaudeClient:
     
     def __init__(self, api_key: str, model: str = "claude-haiku-4-20250514"):
         self.client = anthropic.Anthropic(api_key=api_key)
+        self.async_client = anthropic.AsyncAnthropic(api_key=api_key)
         self.model = model
         self.default_max_tokens = 4096
         
@@ -21,7 +22,7 @@ class ClaudeClient:
         messages: List[Dict[str, Any]],
         tools: Optional[List[Dict[str, Any]]] = None,
         max_tokens: Optional[int] = None,
-        system: Optional[str] = None,
+        system: Optional[Union[str, List[Dict[str, Any]]]] = None,
         **kwargs
     ) -> anthropic.types.Message:
         """
@@ -31,7 +32,8 @@ class ClaudeClient:
             messages: Conversation history in Messages API format
             tools: List of available tools in Claude API format
             max_tokens: Maximum tokens for response (default: 4096)
-            system: System prompt
+            system: System prompt, as a string or a list of text blocks
+                (use blocks to attach cache_control for prompt caching)
             **kwargs: Additional parameters for the API
             
         Returns:
@@ -64,6 +66,63 @@ class ClaudeClient:
         
         return response
     
+    async def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[Union[str, List[Dict[str, Any]]]] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        on_tool_use: Optional[Callable[[Dict[str, Any]], None]] = None,
+        **kwargs
+    ) -> anthropic.types.Message:
+        """
+        Stream a message from the Claude API without blocking the event loop.
+        
+        Takes the same arguments as create_message, plus:
+            on_text: Called with each text delta as it arrives
+            on_tool_use: Called with a tool use dict ('id', 'name', 'input')
+                as soon as that block's input has finished streaming
+            
+        Returns:
+            The final Message object from Claude
+        """
+        params = {
+            "model": self.model,
+            "max_tokens": max_tokens or self.default_max_tokens,
+            "messages": messages,
+        }
+        
+        if tools:
+            params["tools"] = tools
+        
+        if system:
+            params["system"] = system
+        
+        params.update(kwargs)
+        
+        logger.info(f"Streaming request to Claude ({self.model})")
+        
+        async with self.async_client.messages.stream(**params) as stream:
+            async for event in stream:
+                if event.type == "text":
+                    if on_text:
+                        on_text(event.text)
+                elif event.type == "content_block_stop" and on_tool_use:
+                    block = stream.current_message_snapshot.content[event.index]
+                    if block.type == "tool_use":
+                        on_tool_use({
+                            "id": block.id,
+                            "name": block.name,
+                            "input": block.input
+                        })
+            response = await stream.get_final_message()
+        
+        logger.info(f"Received response: {response.stop_reason}")
+        logger.debug(f"  Usage: {response.usage}")
+        
+        return response
+    
     def extract_text(self, response: anthropic.types.Message) -> str:
         """Extract text content from a Claude response."""
         text_parts = []
@@ -88,6 +147,25 @@ class ClaudeClient:
                     "input": block.input
                 })
         return tool_uses
+    
+    def split_content(self, response: anthropic.types.Message) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Extract text and tool uses from a Claude response in one pass.
+        
+        Returns:
+            (text joined as extract_text does, tool uses as extract_tool_uses does)
+        """
+        text_parts = []
+        tool_uses = []
+        add_text = text_parts.append
+        add_tool_use = tool_uses.append
+        for block in response.content:
+            block_type = block.type
+            if block_type == "text":
+                add_text(block.text)
+            elif block_type == "tool_use":
+                add_tool_use({"id": block.id, "name": block.name, "input": block.input})
+        return "\n".join(text_parts), tool_uses
 
 
 # Example usage
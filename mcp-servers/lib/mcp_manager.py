@@ -15,6 +15,10 @@ from mcp.client.stdio import stdio_client
 
 logger = logging.getLogger(__name__)
 
+# Tools that only observe state (matched without the "windows-mcp-" prefix).
+# Calls to these may overlap; anything else is treated as mutating.
+PARALLEL_SAFE_TOOLS = frozenset({"read", "snapshot", "wait", "scrape", "vision", "system-info"})
+
 
 class MCPManager:
     """Manages connections to multiple MCP servers and tool discovery."""
@@ -23,6 +27,7 @@ class MCPManager:
         self.config_path = config_path
         self.sessions: Dict[str, ClientSession] = {}
         self.tools: List[Dict[str, Any]] = []
+        self.tools_version = 0  # Bumped whenever self.tools changes
         self.server_configs: Dict[str, Dict] = {}
         self._stdio_contexts: Dict[str, Any] = {}
         
@@ -196,6 +201,7 @@ class MCPManager:
             for tool in server_tools:
                 claude_tool = self._mcp_to_claude_tool(tool, server_name)
                 self.tools.append(claude_tool)
+            self.tools_version += 1
             
             logger.info(f"✅ CONNECTION SUCCESSFUL: {server_name}")
             logger.info(f"{'='*70}")
@@ -233,9 +239,28 @@ class MCPManager:
             "description": mcp_tool.description,
             "input_schema": mcp_tool.inputSchema,
             "_mcp_server": server_name,
-            "_original_name": mcp_tool.name
+            "_original_name": mcp_tool.name,
+            "_parallel_safe": self._is_read_only(mcp_tool)
         }
     
+    def _is_read_only(self, mcp_tool: Any) -> bool:
+        """Decide whether a tool can run alongside other calls in the same turn."""
+        # Prefer the server's own annotation when it provides one
+        annotations = getattr(mcp_tool, "annotations", None)
+        read_only = getattr(annotations, "readOnlyHint", None)
+        if read_only is not None:
+            return read_only
+        
+        base_name = mcp_tool.name.lower().removeprefix("windows-mcp-").removeprefix("windows-mcp:")
+        return base_name in PARALLEL_SAFE_TOOLS
+    
+    def is_parallel_safe(self, tool_name: str) -> bool:
+        """Whether a tool (by Claude-facing name) only reads state."""
+        for tool in self.tools:
+            if tool['name'] == tool_name:
+                return tool.get('_parallel_safe', False)
+        return False
+    
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """Execute a tool call via the appropriate MCP server."""
         logger.info(f"🔧 CALLING TOOL: {tool_name}")
@@ -281,6 +306,9 @@ class MCPManager:
                 "input_schema": tool["input_schema"]
             }
             clean_tools.append(clean_tool)
+        if clean_tools:
+            # Cache breakpoint on the last tool caches the whole tools array
+            clean_tools[-1]["cache_control"] = {"type": "ephemeral"}
         return clean_tools
     
     async def close(self):
@@ -308,6 +336,7 @@ class MCPManager:
         self.sessions.clear()
         self._stdio_contexts.clear()
         self.tools.clear()
+        self.tools_version += 1
         logger.info("✅ MCP Manager closed")
 
 
@@ -2,10 +2,49 @@
 from tools.base_tool import BaseTool
 from mcp.types import Tool, TextContent
 from typing import Sequence
+import asyncio
 import subprocess
 
+LAUNCH_TIMEOUT = 15  # Seconds to wait for the PowerShell host to answer a launch
+
 class AppTool(BaseTool):
     requires_admin = True
+    
+    def __init__(self):
+        # Long-lived PowerShell host, so launches skip a cmd.exe spawn each time.
+        # PowerShell starts slower than cmd.exe, so the first launch starts the
+        # host in the background and goes through cmd.exe itself
+        self._shell = None
+        self._lock = asyncio.Lock()
+    
+    def _host(self) -> subprocess.Popen:
+        if self._shell is None or self._shell.poll() is not None:
+            self._shell = subprocess.Popen(["powershell", "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", "-"],
+                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                           text=True, bufsize=1)
+        return self._shell
+    
+    def _reset_host(self):
+        """Kill the host (e.g. after it stalled) so the next launch starts a fresh one."""
+        if self._shell is not None:
+            try:
+                self._shell.kill()
+            except OSError:
+                pass
+            self._shell = None
+    
+    def _start_process(self, name: str) -> str:
+        """Start an executable in the PowerShell host; returns its error message, or "" on success."""
+        shell = self._host()
+        name = name.replace("'", "''")
+        shell.stdin.write(f"try {{ Start-Process -FilePath '{name}' -ErrorAction Stop; 'OK' }} "
+                          f"catch {{ 'ERR ' + ($_.Exception.Message -replace '\\s+', ' ') }}\n")
+        shell.stdin.flush()
+        reply = shell.stdout.readline()
+        if not reply:
+            raise OSError("PowerShell host exited")
+        return "" if reply.strip() == "OK" else reply.strip().removeprefix("ERR ")
+    
     def get_tool_definition(self) -> Tool:
         return Tool(name="Windows-MCP:App", description="Manages Windows applications: launch, resize, switch.",
                     inputSchema={"type": "object", "properties": {"action": {"type": "string", "enum": ["launch", "resize", "switch"]},
@@ -14,6 +53,30 @@ class AppTool(BaseTool):
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
         self.validate_arguments(arguments, ["action", "name"])
         if arguments["action"] == "launch":
-            subprocess.Popen(arguments["name"], shell=True)
-            return [TextContent(type="text", text=f"Launched: {arguments['name']}")]
+            name = arguments["name"]
+            # Launch strings with arguments or quoted paths keep cmd.exe's parsing
+            if any(ch.isspace() for ch in name.strip()):
+                subprocess.Popen(name, shell=True)
+                return [TextContent(type="text", text=f"Launched: {name}")]
+            if self._shell is None or self._shell.poll() is not None:
+                subprocess.Popen(name, shell=True)
+                try:
+                    self._host()
+                except OSError:
+                    self._shell = None
+                return [TextContent(type="text", text=f"Launched: {name}")]
+            # The blocking pipe I/O runs in a thread so a stalled host can't freeze the server
+            async with self._lock:
+                try:
+                    error = await asyncio.wait_for(asyncio.to_thread(self._start_process, name), LAUNCH_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self._reset_host()
+                    error = f"PowerShell did not answer within {LAUNCH_TIMEOUT}s"
+                except OSError:
+                    self._reset_host()
+                    subprocess.Popen(name, shell=True)
+                    error = ""
+            if error:
+                return [TextContent(type="text", text=f"ERROR: Failed to launch {name}: {error}")]
+            return [TextContent(type="text", text=f"Launched: {name}")]
         return [TextContent(type="text", text="Action completed")]
@@ -2,7 +2,7 @@
 from tools.base_tool import BaseTool
 from mcp.types import Tool, TextContent
 from typing import Sequence
-import pyautogui
+from utils.send_input import click_inputs, text_inputs, send_inputs
 
 class MultiEditTool(BaseTool):
     def get_tool_definition(self) -> Tool:
@@ -12,7 +12,10 @@ class MultiEditTool(BaseTool):
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
         self.validate_arguments(arguments, ["edits"])
         count = len(arguments["edits"])
+        # Interleave clicks and keystrokes into a single SendInput batch
+        inputs = []
         for edit in arguments["edits"]:
-            pyautogui.click(edit["x"], edit["y"])
-            pyautogui.write(edit["text"])
+            inputs.extend(click_inputs(edit["x"], edit["y"]))
+            inputs.extend(text_inputs(edit["text"]))
+        send_inputs(inputs)
         return [TextContent(type="text", text=f"Edited {count} fields")]
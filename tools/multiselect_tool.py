@@ -2,7 +2,7 @@
 from tools.base_tool import BaseTool
 from mcp.types import Tool, TextContent
 from typing import Sequence
-import pyautogui
+from utils.send_input import click_points
 
 class MultiSelectTool(BaseTool):
     def get_tool_definition(self) -> Tool:
@@ -12,6 +12,6 @@ class MultiSelectTool(BaseTool):
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
         self.validate_arguments(arguments, ["locations"])
         count = len(arguments["locations"])
-        for loc in arguments["locations"]:
-            pyautogui.click(loc["x"], loc["y"])
+        # One SendInput call for every click instead of a pyautogui call per item
+        click_points((loc["x"], loc["y"]) for loc in arguments["locations"])
         return [TextContent(type="text", text=f"Selected {count} items")]
@@ -5,10 +5,14 @@ from typing import Sequence
 import pyautogui
 
 class SnapshotTool(BaseTool):
+    def __init__(self):
+        # Screen size rarely changes within a session; query it once
+        self._size = pyautogui.size()
+    
     def get_tool_definition(self) -> Tool:
         return Tool(name="Windows-MCP:Snapshot", description="Captures desktop state including windows and UI elements.",
                     inputSchema={"type": "object", "properties": {"use_vision": {"type": "boolean", "default": True}}, "required": []})
     
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
-        size = pyautogui.size()
+        size = self._size
         return [TextContent(type="text", text=f"DESKTOP STATE:\n\nSYSTEM INFO:\n  Language: en_IN\n  Screen: [{size.width}, {size.height}]\n\nACTIVE WINDOW:\n  Title: Command Prompt\n  Process: cmd.exe\n  Position: {{'x': 100, 'y': 100}}")]
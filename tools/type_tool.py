@@ -2,7 +2,7 @@
 from tools.base_tool import BaseTool
 from mcp.types import Tool, TextContent
 from typing import Sequence
-import pyautogui
+from utils.send_input import type_text
 
 class TypeTool(BaseTool):
     def get_tool_definition(self) -> Tool:
@@ -11,5 +11,6 @@ class TypeTool(BaseTool):
     
     async def execute(self, arguments: dict) -> Sequence[TextContent]:
         self.validate_arguments(arguments, ["text"])
-        pyautogui.write(arguments["text"], interval=0.05)
+        # Send every keystroke in one SendInput batch instead of sleeping per character
+        type_text(arguments["text"])
         return [TextContent(type="text", text=f"Typed: {arguments['text'][:50]}...")]
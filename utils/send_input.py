@@ -0,0 +1,115 @@
+"""Batched Windows input via user32.SendInput"""
+import ctypes
+import functools
+from ctypes import wintypes
+from typing import Iterable, List, Tuple
+
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_LEFTDOWN = 0x0002
+MOUSEEVENTF_LEFTUP = 0x0004
+MOUSEEVENTF_ABSOLUTE = 0x8000
+
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+
+VK_TAB = 0x09
+VK_RETURN = 0x0D
+
+SM_CXSCREEN = 0
+SM_CYSCREEN = 1
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", wintypes.WPARAM)]
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                ("time", wintypes.DWORD), ("dwExtraInfo", wintypes.WPARAM)]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _anonymous_ = ("u",)
+    _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+
+@functools.lru_cache(maxsize=1)
+def _user32():
+    return ctypes.WinDLL("user32", use_last_error=True)
+
+
+def _mouse(dx: int, dy: int, flags: int) -> INPUT:
+    return INPUT(type=INPUT_MOUSE, mi=MOUSEINPUT(dx=dx, dy=dy, dwFlags=flags))
+
+
+def _key(vk: int, scan: int, flags: int) -> INPUT:
+    return INPUT(type=INPUT_KEYBOARD, ki=KEYBDINPUT(wVk=vk, wScan=scan, dwFlags=flags))
+
+
+def click_inputs(x: float, y: float) -> List[INPUT]:
+    """Build move + left down + left up records for a click at screen (x, y)."""
+    user32 = _user32()
+    width = user32.GetSystemMetrics(SM_CXSCREEN)
+    height = user32.GetSystemMetrics(SM_CYSCREEN)
+    # Absolute coordinates are normalized to 0..65535 across the primary screen
+    dx = int(x * 65535 / max(width - 1, 1))
+    dy = int(y * 65535 / max(height - 1, 1))
+    return [
+        _mouse(dx, dy, MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE),
+        _mouse(dx, dy, MOUSEEVENTF_LEFTDOWN | MOUSEEVENTF_ABSOLUTE),
+        _mouse(dx, dy, MOUSEEVENTF_LEFTUP | MOUSEEVENTF_ABSOLUTE),
+    ]
+
+
+def text_inputs(text: str) -> List[INPUT]:
+    """Build key down/up records that type text as Unicode characters."""
+    inputs = []
+    for ch in text.replace("\r\n", "\n"):
+        if ch == "\n" or ch == "\t":
+            vk = VK_RETURN if ch == "\n" else VK_TAB
+            inputs.append(_key(vk, 0, 0))
+            inputs.append(_key(vk, 0, KEYEVENTF_KEYUP))
+            continue
+        # Characters outside the BMP are sent as a UTF-16 surrogate pair
+        encoded = ch.encode("utf-16-le")
+        for i in range(0, len(encoded), 2):
+            unit = int.from_bytes(encoded[i:i + 2], "little")
+            inputs.append(_key(0, unit, KEYEVENTF_UNICODE))
+            inputs.append(_key(0, unit, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+    return inputs
+
+
+def send_inputs(inputs: List[INPUT]) -> int:
+    """Submit all input records in a single SendInput call."""
+    if not inputs:
+        return 0
+    array = (INPUT * len(inputs))(*inputs)
+    sent = _user32().SendInput(len(inputs), array, ctypes.sizeof(INPUT))
+    if sent != len(inputs):
+        raise ctypes.WinError(ctypes.get_last_error())
+    return sent
+
+
+def click_points(points: Iterable[Tuple[float, float]]) -> int:
+    """Left-click each (x, y) point using one batched SendInput call."""
+    inputs = []
+    for x, y in points:
+        inputs.extend(click_inputs(x, y))
+    return send_inputs(inputs)
+
+
+def type_text(text: str) -> int:
+    """Type text using one batched SendInput call."""
+    return send_inputs(text_inputs(text))